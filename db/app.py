@@ -1,13 +1,36 @@
+import base64
+import html
 import json 
-from flask import Flask, request, session
-from db import db, User, JournalEntry
+import logging
+from flask import Flask, request, session, g
+from db import db, User, JournalEntry, Job
+from sqlalchemy import event
+from sqlalchemy.orm import load_only, undefer_group
 from datetime import datetime
 import os
+import re
+import shutil
+import sys
+import time
+import uuid
 
+# Make the shared thisapp package importable when running from the db directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from thisapp import metrics
+from thisapp.structured_logging import configure_logging
+from migrations import upgrade as apply_migrations
+from settings import DB_PROFILE, profile, set_sqlite_pragmas
 
-# define db filename
-instance_path = os.path.join(os.path.dirname(__file__), "instance")
+configure_logging(profile["log_level"])
+logger = logging.getLogger("journal_api")
+
+
+# define db filename (DB_INSTANCE_PATH moves the database and recordings, e.g. for tests)
+instance_path = os.getenv("DB_INSTANCE_PATH", os.path.join(os.path.dirname(__file__), "instance"))
 db_filename = os.path.join(instance_path, "data.db")
+# Recordings waiting to be transcribed by the workers
+audio_path = os.path.join(instance_path, "audio")
+ALLOWED_AUDIO_EXTENSIONS = {".m4a", ".mp3", ".webm", ".mp4", ".mpga", ".wav", ".mpeg"}
 
 app = Flask(__name__)
 
@@ -17,7 +40,11 @@ app.secret_key = os.urandom(24)
 # Use absolute path for database in instance folder
 app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_filename}"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SQLALCHEMY_ECHO"] = True
+# Statements are logged through the JSON handler rather than echo's own stream handler
+app.config["SQLALCHEMY_ECHO"] = False
+if profile["echo"]:
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = profile["engine_options"]
 
 
 # initialize app
@@ -25,8 +52,21 @@ db.init_app(app)
 with app.app_context():
     # Ensure instance directory exists
     os.makedirs(instance_path, exist_ok=True)
-    
+    os.makedirs(audio_path, exist_ok=True)
+
+    if profile["pragmas"]:
+        event.listen(db.engine, "connect", lambda dbapi_connection, _: set_sqlite_pragmas(dbapi_connection, profile["pragmas"]))
+    logger.info("Database ready", extra={"profile": DB_PROFILE, "database": db_filename})
+    # New databases get the current schema from create_all; existing ones are brought up to date by migrations
+    fresh_database = not db.inspect(db.engine).has_table("journal_entries")
     db.create_all()
+    connection = db.engine.raw_connection()
+    try:
+        applied = apply_migrations(connection.connection, stamp_only=fresh_database)
+        if applied and not fresh_database:
+            logger.info("Applied schema migrations", extra={"versions": applied})
+    finally:
+        connection.close()
     # Create default user if it doesn't exist
     default_user = User.query.first()
     if not default_user:
@@ -55,6 +95,32 @@ def failure_response(message, code=404):
     return json.dumps({"error": message}), code
 
 
+# request metrics
+@app.before_request
+def start_request_timer():
+    g.request_started_at = time.perf_counter()
+    metrics.http_requests_in_flight.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    g.request_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_timer(exc=None):
+    if "request_started_at" not in g:
+        return
+    # Label by the matched rule (e.g. /api/journal_entries/<int:entry_id>/), not the raw URL
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.http_requests_in_flight.dec()
+    metrics.http_request_duration_seconds.observe(time.perf_counter() - g.request_started_at, method=request.method, route=route)
+    metrics.http_requests_total.inc(method=request.method, route=route, status=g.get("request_status", 500))
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
+
 # user routes
 @app.route("/")
 def root():
@@ -65,7 +131,7 @@ def create_journal_entry():
     body = json.loads(request.data)
     user_id = get_current_user()
     
-    print("Received data:", body)  # Add logging
+    logger.debug("Received entry", extra={"body": body})
     
     # Extract fields from request body, handling nested dictionaries
     entry_data = {
@@ -77,40 +143,229 @@ def create_journal_entry():
     }
     
     try:
-        print("Creating entry with data:", entry_data)  # Add logging
         new_entry = JournalEntry(**entry_data)
-        print("Created JournalEntry object")  # Add logging
-        
         db.session.add(new_entry)
-        print("Added to session")  # Add logging
-        
-        db.session.flush()  # Flush to get the ID
-        print(f"Entry ID after flush: {new_entry.entry_id}")  # Add logging
-        
         db.session.commit()
-        print(f"Committed successfully. Entry ID: {new_entry.entry_id}")  # Add logging
-        
-        # Verify the entry exists
-        saved_entry = JournalEntry.query.get(new_entry.entry_id)
-        if saved_entry:
-            print(f"Successfully verified entry in database: {saved_entry.serialize()}")
-        else:
-            print("Warning: Entry not found after commit!")
+        logger.info("Created entry", extra={"entry_id": new_entry.entry_id, "user_id": user_id})
+
+        # Read the row back to catch silent write failures while developing; skipped in production
+        if profile["verify_writes"] and JournalEntry.query.get(new_entry.entry_id) is None:
+            logger.warning("Entry not found after commit", extra={"entry_id": new_entry.entry_id})
             
         return success_response(new_entry.serialize(), 201)
     except Exception as e:
-        print(f"Error creating entry: {str(e)}")  # Add logging
+        logger.exception("Failed to create entry", extra={"user_id": user_id})
         db.session.rollback()
         return failure_response(f"Failed to create entry: {str(e)}", 500)
 
 
 
+DEFAULT_PAGE_SIZE = int(os.getenv("ENTRIES_PAGE_SIZE", "20"))
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(entry):
+    """Opaque cursor pointing just past entry in (datetime_created, entry_id) order."""
+    position = {"datetime_created": entry.datetime_created.isoformat(), "entry_id": entry.entry_id}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_cursor(cursor):
+    position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(position["datetime_created"]), int(position["entry_id"])
+
+def requested_fields(default):
+    """Fields named in ?fields= (comma separated, or "all"), else default. Raises ValueError on unknown ones."""
+    value = request.args.get("fields")
+    if not value:
+        return default
+    if value == "all":
+        return JournalEntry.FIELDS
+    fields = tuple(field.strip() for field in value.split(",") if field.strip())
+    unknown = set(fields) - set(JournalEntry.FIELDS)
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields {sorted(unknown)}; choose from {list(JournalEntry.FIELDS)}")
+    return fields
+
+def projection(fields):
+    """Query options that load only the columns behind fields."""
+    columns = [getattr(JournalEntry, field) for field in fields if field != "status"]
+    # The primary key and sort key are always needed for statuses and cursors
+    return load_only(JournalEntry.entry_id, JournalEntry.datetime_created, *columns)
+
 @app.route("/api/journal_entries/")
 def get_all_journal_entries():
-    # Only get entries for current user
+    """
+    Entries of the current user, newest first, one page at a time.
+    Pass the returned next_cursor as ?cursor= to get the following page; it is null on the last page.
+    Keyset pagination, so every page costs the same however deep it is.
+
+    Only entry_id, title, datetime_created and status are returned unless ?fields= asks
+    for more (e.g. fields=entry_id,title,summary or fields=all).
+    """
+    user_id = get_current_user()
+    try:
+        fields = requested_fields(JournalEntry.LIST_FIELDS)
+    except ValueError as e:
+        return failure_response(str(e), 400)
+    try:
+        limit = min(max(int(request.args.get("limit", DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        cursor = request.args.get("cursor")
+        position = decode_cursor(cursor) if cursor else None
+    except (ValueError, KeyError, TypeError):
+        return failure_response("Invalid limit or cursor", 400)
+
+    query = JournalEntry.query.options(projection(fields)).filter(JournalEntry.user_id == user_id)
+    if position:
+        created, entry_id = position
+        query = query.filter(
+            JournalEntry.datetime_created <= created,
+            db.or_(JournalEntry.datetime_created < created, JournalEntry.entry_id < entry_id)
+        )
+    # One extra row tells us whether there is another page
+    entries = (
+        query.order_by(JournalEntry.datetime_created.desc(), JournalEntry.entry_id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = encode_cursor(entries[limit - 1]) if len(entries) > limit else None
+    entries = entries[:limit]
+
+    statuses = Job.entry_statuses([entry.entry_id for entry in entries])
+    return success_response({
+        "entries": [entry.serialize(statuses[entry.entry_id], fields) for entry in entries],
+        "next_cursor": next_cursor,
+    })
+
+SEARCH_TOKEN = re.compile(r"\w+", re.UNICODE)
+# bm25 reads the whole index of every searched word to weigh it, and a word found in most
+# entries carries no ranking signal anyway: queries matching more than SEARCH_CANDIDATES
+# entries are listed newest first instead
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "1000"))
+# Stand-ins for the match highlighting, swapped for <mark> tags once the snippet is escaped
+SNIPPET_OPEN, SNIPPET_CLOSE = "\x02", "\x03"
+
+def fts_query(text):
+    """
+    FTS5 MATCH expression for free text: every word must match and the last one may be a prefix.
+    Each word is quoted, so FTS5 operators and syntax in the input are searched as plain words.
+    """
+    tokens = SEARCH_TOKEN.findall(text)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"' for token in tokens) + "*"
+
+def snippet_html(snippet):
+    escaped = html.escape(snippet or "")
+    return escaped.replace(SNIPPET_OPEN, "<mark>").replace(SNIPPET_CLOSE, "</mark>")
+
+@app.route("/api/journal_entries/search/")
+def search_journal_entries():
+    """
+    The current user's entries matching ?q=, best match first (bm25, title weighted highest).
+    Each result carries the list fields plus an HTML snippet of the best matching column with
+    the matched words in <mark> tags, and its rank (lower is better). Queries matching more than
+    SEARCH_CANDIDATES entries come back newest first, with a null rank.
+    """
     user_id = get_current_user()
-    entries = [entry.serialize() for entry in JournalEntry.query.filter_by(user_id=user_id).all()]
-    return success_response(entries)
+    query = fts_query(request.args.get("q", ""))
+    if query is None:
+        return failure_response("Search query must contain at least one word", 400)
+    try:
+        limit = min(max(int(request.args.get("limit", DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return failure_response("Invalid limit", 400)
+    params = {"query": query, "user_id": user_id, "limit": limit, "candidates": SEARCH_CANDIDATES,
+              "open": SNIPPET_OPEN, "close": SNIPPET_CLOSE}
+    # CROSS JOIN keeps the index as the outer loop; otherwise SQLite may walk all of the
+    # user's entries and probe the index once for each
+    match_sql = (
+        "FROM journal_entries_fts CROSS JOIN journal_entries ON journal_entries.entry_id = journal_entries_fts.rowid "
+        "WHERE journal_entries_fts MATCH :query AND journal_entries.user_id = :user_id "
+    )
+
+    # Stops after SEARCH_CANDIDATES matches rather than counting them all
+    unselective = db.session.execute(
+        db.text("SELECT 1 " + match_sql + "LIMIT 1 OFFSET :candidates"), params
+    ).scalar() is not None
+    rank, order = ("NULL", "journal_entries_fts.rowid DESC") if unselective else ("rank", "rank")
+    # snippet() is only evaluated for the rows that make the limit
+    matches = db.session.execute(
+        db.text(
+            f"SELECT journal_entries_fts.rowid AS entry_id, {rank} AS rank, "
+            "snippet(journal_entries_fts, -1, :open, :close, '…', 16) AS snippet "
+            + match_sql + f"ORDER BY {order} LIMIT :limit"
+        ),
+        params
+    ).all()
+
+    ids = [match.entry_id for match in matches]
+    entries = {
+        entry.entry_id: entry
+        for entry in JournalEntry.query.options(projection(JournalEntry.LIST_FIELDS)).filter(JournalEntry.entry_id.in_(ids))
+    }
+    statuses = Job.entry_statuses(ids)
+    return success_response({
+        "results": [
+            {
+                **entries[match.entry_id].serialize(statuses[match.entry_id], JournalEntry.LIST_FIELDS),
+                "snippet": snippet_html(match.snippet),
+                "rank": match.rank,
+            }
+            for match in matches
+        ],
+    })
+
+@app.route("/api/journal_entries/audio/", methods=["POST"])
+def create_journal_entry_from_audio():
+    """
+    Create an entry from a recording (the raw request body) and queue it for processing.
+    Workers (worker.py) transcribe and analyze it; the entry reports "processing" until then.
+    """
+    filename = request.args.get("filename", "audio.wav")
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in ALLOWED_AUDIO_EXTENSIONS:
+        return failure_response("Unsupported file type.", 400)
+
+    stored_path = os.path.join(audio_path, f"{uuid.uuid4().hex}{extension}")
+    with open(stored_path, "wb") as f:
+        shutil.copyfileobj(request.stream, f)
+    if os.path.getsize(stored_path) == 0:
+        os.remove(stored_path)
+        return failure_response("Empty request body.", 400)
+
+    try:
+        entry = JournalEntry(user_id=get_current_user())
+        db.session.add(entry)
+        db.session.flush()
+        db.session.add(Job(
+            entry_id=entry.entry_id,
+            stage="transcribe",
+            payload=json.dumps({"audio_path": stored_path, "filename": filename})
+        ))
+        db.session.commit()
+        return success_response(entry.serialize("processing"), 202)
+    except Exception as e:
+        db.session.rollback()
+        os.remove(stored_path)
+        return failure_response(f"Failed to create entry: {str(e)}", 500)
+
+@app.route("/api/journal_entries/<int:entry_id>/jobs/")
+def get_journal_entry_jobs(entry_id):
+    if not JournalEntry.query.filter_by(entry_id=entry_id, user_id=get_current_user()).first():
+        return failure_response("Entry not found")
+    jobs = Job.query.filter_by(entry_id=entry_id).order_by(Job.id).all()
+    return success_response([job.serialize() for job in jobs])
+
+@app.route("/api/journal_entries/<int:entry_id>/")
+def get_journal_entry(entry_id):
+    # The detail view needs the full text, so load the deferred content columns in the same query
+    entry = (
+        JournalEntry.query.options(undefer_group("content"))
+        .filter_by(entry_id=entry_id, user_id=get_current_user())
+        .first()
+    )
+    if not entry:
+        return failure_response("Entry not found")
+    return success_response(entry.serialize(Job.entry_statuses([entry_id])[entry_id]))
 
 @app.route("/api/journal_entries/<int:entry_id>/", methods=["POST"])
 def post_analysis_entry_update(entry_id, **kwargs):
@@ -137,7 +392,7 @@ def delete_journal_entry(entry_id):
     Delete a journal entry by its ID
     """
     # Get the entry
-    entry = JournalEntry.query.filter_by(entry_id=entry_id).first()
+    entry = JournalEntry.query.options(undefer_group("content")).filter_by(entry_id=entry_id).first()
     if not entry:
         return failure_response("Entry not found")
     
@@ -146,13 +401,16 @@ def delete_journal_entry(entry_id):
     if entry.user_id != user_id:
         return failure_response("Unauthorized to delete this entry", 403)
     
-    # Delete the entry
+    # Serialize first: the instance is detached once the delete is committed
+    deleted_entry = entry.serialize()
+    # Delete the entry along with its processing jobs
+    Job.query.filter_by(entry_id=entry_id).delete()
     db.session.delete(entry)
     db.session.commit()
     
     return success_response({
         "message": f"Entry {entry_id} successfully deleted",
-        "deleted_entry": entry.serialize()
+        "deleted_entry": deleted_entry
     })
 
 
@@ -166,13 +424,13 @@ def get_journal_entries_by_date():
             target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         except ValueError:
             return {"error": "Invalid date format, should be YYYY-MM-DD"}, 400
-        print("target_date: ", target_date)
+        logger.debug("Listing entries by date", extra={"date": target_date})
         
         start_date = datetime(target_date.year, target_date.month, target_date.day, 0, 0, 0)
         end_date = datetime(target_date.year, target_date.month, target_date.day, 23, 59, 59)
         
         # Query entries between start and end of the day for the specific user
-        entries = JournalEntry.query.filter(
+        entries = JournalEntry.query.options(undefer_group("content")).filter(
             JournalEntry.user_id == user_id,
             JournalEntry.datetime_created >= start_date,
             JournalEntry.datetime_created <= end_date
@@ -0,0 +1,128 @@
+"""
+Re-run title/summary/key point generation over every journal entry.
+
+Entries are read in entry_id order in batches, analyzed with bounded concurrency through
+analyze_transcript.analyze_entry, and written back one transaction per batch. After each
+batch the last entry_id is saved to a checkpoint file so an interrupted run resumes there.
+
+Usage:
+    python backfill.py --concurrency 8 --batch-size 50
+    python backfill.py --stub          # offline run against the stub model backend
+    python backfill.py --restart       # ignore the checkpoint and start from the beginning
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+FASTAPI_APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../fastapi-app/app'))
+# The repo root, for the shared thisapp package the analysis code imports
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(__file__), "instance", "backfill_checkpoint.json")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Re-analyze all journal entries")
+    parser.add_argument("--batch-size", type=int, default=50, help="entries read and committed per batch")
+    parser.add_argument("--concurrency", type=int, default=8, help="entries analyzed at the same time")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="checkpoint file used to resume")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many entries")
+    parser.add_argument("--stub", action="store_true", help="use the offline stub model backend")
+    return parser.parse_args()
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {"last_entry_id": 0, "processed": 0, "failed": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    # Write then rename so a crash never leaves a half written checkpoint
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+async def analyze_batch(rows, analyze_entry, semaphore):
+    """Analyze (entry_id, transcription) rows; returns (updates, failed entry ids)."""
+    async def analyze(entry_id, transcription):
+        async with semaphore:
+            try:
+                analysis = await analyze_entry(transcription)
+                return {
+                    "entry_id": entry_id,
+                    "title": analysis.title,
+                    "summary": analysis.summary,
+                    "key_insights": analysis.key_points,
+                }
+            except Exception as e:
+                print(f"Entry {entry_id} failed: {e}")
+                return entry_id
+
+    results = await asyncio.gather(*(analyze(entry_id, transcription) for entry_id, transcription in rows))
+    updates = [result for result in results if isinstance(result, dict)]
+    failed = [result for result in results if not isinstance(result, dict)]
+    return updates, failed
+
+
+async def run(args):
+    if args.stub:
+        os.environ["BEDROCK_BACKEND"] = "stub"
+    sys.path.extend([REPO_ROOT, FASTAPI_APP_DIR])
+    from analyze_transcript import analyze_entry
+    from app import app, db, JournalEntry
+
+    checkpoint = {"last_entry_id": 0, "processed": 0, "failed": []} if args.restart else load_checkpoint(args.checkpoint)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    with app.app_context():
+        remaining = JournalEntry.query.filter(JournalEntry.entry_id > checkpoint["last_entry_id"]).count()
+        if args.limit is not None:
+            remaining = min(remaining, args.limit)
+        print(f"Resuming after entry {checkpoint['last_entry_id']}, {remaining} entries to analyze")
+
+        done = 0
+        started_at = time.perf_counter()
+        while done < remaining:
+            # Only the columns needed for analysis, not whole rows
+            rows = (
+                db.session.query(JournalEntry.entry_id, JournalEntry.transcription)
+                .filter(JournalEntry.entry_id > checkpoint["last_entry_id"])
+                .order_by(JournalEntry.entry_id)
+                .limit(min(args.batch_size, remaining - done))
+                .all()
+            )
+            if not rows:
+                break
+
+            updates, failed = await analyze_batch(rows, analyze_entry, semaphore)
+            try:
+                db.session.bulk_update_mappings(JournalEntry, updates)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+            done += len(rows)
+            checkpoint["last_entry_id"] = rows[-1].entry_id
+            checkpoint["processed"] += len(updates)
+            checkpoint["failed"].extend(failed)
+            save_checkpoint(args.checkpoint, checkpoint)
+
+            elapsed = time.perf_counter() - started_at
+            rate = done / elapsed if elapsed else 0.0
+            eta = (remaining - done) / rate if rate else 0.0
+            print(f"{done}/{remaining} entries, {rate:.1f} entries/s, ETA {eta:.0f}s, {len(failed)} failed in batch")
+
+    print(f"Backfill finished: {checkpoint['processed']} updated, {len(checkpoint['failed'])} failed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
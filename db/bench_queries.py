@@ -0,0 +1,136 @@
+"""
+Query plans and latency of the journal API's queries, before and after the migrations' indexes.
+
+Seeds a throwaway SQLite database (1M entries by default) with the pre-migration schema, times
+each query, applies migrations.py and times them again, printing EXPLAIN QUERY PLAN for both.
+
+Usage:
+    python bench_queries.py
+    python bench_queries.py --rows 200000 --users 5 --repeat 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from migrations import upgrade
+
+# The schema as db.create_all() built it before any migration
+BASE_SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at DATETIME NOT NULL);
+CREATE TABLE journal_entries (
+    entry_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, datetime_created DATETIME NOT NULL,
+    title VARCHAR, summary VARCHAR, transcription VARCHAR, key_insights VARCHAR
+);
+CREATE TABLE jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, entry_id INTEGER NOT NULL, stage VARCHAR NOT NULL, state VARCHAR NOT NULL,
+    payload VARCHAR, attempts INTEGER NOT NULL, max_attempts INTEGER NOT NULL, run_after DATETIME NOT NULL,
+    lease_owner VARCHAR, lease_expires_at DATETIME, error VARCHAR, created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL
+);
+"""
+
+# name -> (sql, parameters); the same shapes app.py and worker.py issue
+QUERIES = {
+    "list user's entries": (
+        "SELECT * FROM journal_entries WHERE user_id = ?", (1,)),
+    "newest 50 for user": (
+        "SELECT * FROM journal_entries WHERE user_id = ? ORDER BY datetime_created DESC LIMIT 50", (1,)),
+    "entries on one date": (
+        "SELECT * FROM journal_entries WHERE user_id = ? AND datetime_created >= ? AND datetime_created <= ?",
+        (1, "2024-06-01 00:00:00.000000", "2024-06-01 23:59:59.000000")),
+    "status of 50 entries": (
+        "SELECT entry_id, state FROM jobs WHERE entry_id IN (%s) AND state != 'succeeded'" % ",".join("?" * 50),
+        tuple(range(1000, 1050))),
+    "claim next job": (
+        "SELECT id FROM jobs WHERE (state = 'queued' AND run_after <= ?) OR (state = 'running' AND lease_expires_at < ?) "
+        "ORDER BY run_after, id LIMIT 1",
+        ("2025-01-01 00:00:00.000000", "2025-01-01 00:00:00.000000")),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark journal queries with and without indexes")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="journal entries to seed")
+    parser.add_argument("--users", type=int, default=10, help="users the entries are spread over")
+    parser.add_argument("--jobs", type=int, default=200_000, help="jobs to seed")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per query")
+    return parser.parse_args()
+
+
+def seed(connection, args):
+    rng = random.Random(0)
+    start = datetime(2022, 1, 1)
+    span = int(timedelta(days=3 * 365).total_seconds())
+    fmt = "%Y-%m-%d %H:%M:%S.%f"
+    connection.executemany(
+        "INSERT INTO users (id, created_at) VALUES (?, ?)",
+        [(user_id, start.strftime(fmt)) for user_id in range(1, args.users + 1)]
+    )
+    batch = 50_000
+    for offset in range(0, args.rows, batch):
+        connection.executemany(
+            "INSERT INTO journal_entries (user_id, datetime_created, title, summary, transcription, key_insights) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (rng.randint(1, args.users), (start + timedelta(seconds=rng.randrange(span))).strftime(fmt),
+                 f"Entry {i}", "A short summary of the day. " * 3, "Transcript text. " * 20, "- one\n- two")
+                for i in range(offset, min(offset + batch, args.rows))
+            ]
+        )
+    states = ["succeeded"] * 90 + ["queued"] * 5 + ["running"] * 3 + ["failed"] * 2
+    connection.executemany(
+        "INSERT INTO jobs (entry_id, stage, state, attempts, max_attempts, run_after, created_at, updated_at) "
+        "VALUES (?, 'analyze', ?, 1, 3, ?, ?, ?)",
+        [
+            (entry_id, rng.choice(states), *(((start + timedelta(seconds=rng.randrange(span))).strftime(fmt),) * 3))
+            for entry_id in range(1, args.jobs + 1)
+        ]
+    )
+    connection.commit()
+    connection.execute("ANALYZE")
+
+
+def measure(connection, repeat):
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        plan = [row[-1] for row in connection.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        timings = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            rows = connection.execute(sql, params).fetchall()
+            timings.append(time.perf_counter() - started_at)
+        results[name] = (plan, statistics.median(timings) * 1000, len(rows))
+    return results
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        connection = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        connection.executescript(BASE_SCHEMA)
+        started_at = time.perf_counter()
+        seed(connection, args)
+        print(f"Seeded {args.rows} entries and {args.jobs} jobs in {time.perf_counter() - started_at:.1f}s\n")
+
+        before = measure(connection, args.repeat)
+        started_at = time.perf_counter()
+        applied = upgrade(connection)
+        connection.execute("ANALYZE")
+        print(f"Applied migrations {applied} in {time.perf_counter() - started_at:.1f}s\n")
+        after = measure(connection, args.repeat)
+        connection.close()
+
+    for name in QUERIES:
+        (plan_before, ms_before, rows), (plan_after, ms_after, _) = before[name], after[name]
+        print(f"{name} ({rows} rows)")
+        print(f"  before: {ms_before:9.2f} ms  {' | '.join(plan_before)}")
+        print(f"  after:  {ms_after:9.2f} ms  {' | '.join(plan_after)}")
+        print(f"  speedup: {ms_before / ms_after:.1f}x\n" if ms_after else "")
+
+
+if __name__ == "__main__":
+    main()
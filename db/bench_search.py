@@ -0,0 +1,145 @@
+"""
+Latency of full-text search over journal entries: LIKE '%...%' scans against the FTS5 index.
+
+Seeds a throwaway SQLite database (1M entries by default) with text drawn from a skewed
+vocabulary, so some words are common and some rare, builds the index with migrations.py
+and times the search endpoint's queries next to always ranking with bm25 and the equivalent
+LIKE scan for each term.
+
+Usage:
+    python bench_search.py
+    python bench_search.py --rows 200000 --repeat 3
+"""
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bench_queries import BASE_SCHEMA
+from migrations import upgrade
+
+VOCABULARY_SIZE = 20_000
+
+# The search endpoint's queries (app.py) for user 1
+MATCH_SQL = (
+    "FROM journal_entries_fts CROSS JOIN journal_entries ON journal_entries.entry_id = journal_entries_fts.rowid "
+    "WHERE journal_entries_fts MATCH ? AND journal_entries.user_id = 1 "
+)
+UNSELECTIVE_SQL = "SELECT 1 " + MATCH_SQL + "LIMIT 1 OFFSET ?"
+SEARCH_SQL = (
+    "SELECT journal_entries_fts.rowid, {rank}, snippet(journal_entries_fts, -1, '[', ']', '…', 16) "
+    + MATCH_SQL + "ORDER BY {order} LIMIT 20"
+)
+RANKED_SQL = SEARCH_SQL.format(rank="rank", order="rank")
+NEWEST_SQL = SEARCH_SQL.format(rank="NULL", order="journal_entries_fts.rowid DESC")
+LIKE_SQL = (
+    "SELECT entry_id FROM journal_entries WHERE user_id = 1 AND "
+    "(title LIKE ? OR summary LIKE ? OR transcription LIKE ? OR key_insights LIKE ?) LIMIT 20"
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark LIKE scans against the FTS5 index")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="journal entries to seed")
+    parser.add_argument("--users", type=int, default=10, help="users the entries are spread over")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per query")
+    parser.add_argument("--candidates", type=int, default=1000, help="the API's SEARCH_CANDIDATES")
+    return parser.parse_args()
+
+
+def word(rank):
+    return f"w{rank}"
+
+
+def seed(connection, args):
+    rng = random.Random(0)
+    # Zipf-like: word k is drawn with weight 1/k
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, VOCABULARY_SIZE + 1)))
+    words = [word(rank) for rank in range(1, VOCABULARY_SIZE + 1)]
+    start = datetime(2022, 1, 1)
+    fmt = "%Y-%m-%d %H:%M:%S.%f"
+    connection.execute("INSERT INTO users (id, created_at) VALUES (1, ?)", (start.strftime(fmt),))
+    batch = 20_000
+    for offset in range(0, args.rows, batch):
+        rows = []
+        for i in range(offset, min(offset + batch, args.rows)):
+            text = rng.choices(words, cum_weights=cum_weights, k=110)
+            rows.append((
+                rng.randint(1, args.users), (start + timedelta(minutes=i)).strftime(fmt),
+                " ".join(text[:4]), " ".join(text[4:30]), " ".join(text[30:100]), " ".join(text[100:])
+            ))
+        connection.executemany(
+            "INSERT INTO journal_entries (user_id, datetime_created, title, summary, transcription, key_insights) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+    connection.commit()
+
+
+def timed(connection, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        rows = connection.execute(sql, params).fetchall()
+        timings.append(time.perf_counter() - started_at)
+    return statistics.median(timings) * 1000, len(rows)
+
+
+def search(connection, match, candidates):
+    unselective = connection.execute(UNSELECTIVE_SQL, (match, candidates)).fetchone() is not None
+    return connection.execute(NEWEST_SQL if unselective else RANKED_SQL, (match,)).fetchall()
+
+
+def timed_search(connection, match, candidates, repeat):
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        rows = search(connection, match, candidates)
+        timings.append(time.perf_counter() - started_at)
+    return statistics.median(timings) * 1000, len(rows)
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        connection = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        connection.executescript(BASE_SCHEMA)
+        started_at = time.perf_counter()
+        seed(connection, args)
+        print(f"Seeded {args.rows} entries in {time.perf_counter() - started_at:.1f}s")
+        started_at = time.perf_counter()
+        upgrade(connection)
+        print(f"Built the full-text index in {time.perf_counter() - started_at:.1f}s\n")
+
+        # Rare to common single words, a two word query and a prefix
+        searches = [
+            (f'"{word(15000)}"', f"%{word(15000)} %"),
+            (f'"{word(500)}"', f"%{word(500)} %"),
+            (f'"{word(20)}"', f"%{word(20)} %"),
+            (f'"{word(1)}"', f"%{word(1)} %"),
+            (f'"{word(300)}" "{word(900)}"', None),
+            (f'"{word(1234)}"*', f"%{word(1234)}%"),
+        ]
+        for match, pattern in searches:
+            fts_ms, fts_rows = timed_search(connection, match, args.candidates, args.repeat)
+            all_ms, _ = timed(connection, RANKED_SQL, (match,), args.repeat)
+            (matches,) = connection.execute(
+                "SELECT count(*) FROM journal_entries_fts WHERE journal_entries_fts MATCH ?", (match,)
+            ).fetchone()
+            print(f"{match} ({matches} matching entries)")
+            print(f"  search:    {fts_ms:9.2f} ms  {fts_rows} results")
+            print(f"  bm25 only: {all_ms:9.2f} ms")
+            if pattern:
+                like_ms, like_rows = timed(connection, LIKE_SQL, (pattern,) * 4, args.repeat)
+                print(f"  like:      {like_ms:9.2f} ms  {like_rows} results, unranked")
+            print()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
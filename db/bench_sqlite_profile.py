@@ -0,0 +1,124 @@
+"""
+Concurrent write/read throughput of the development and production database profiles.
+
+Runs writer threads inserting journal entries and reader threads listing the newest ones
+against a throwaway SQLite database, once per profile in settings.py, and prints
+operations per second, p95 latency and "database is locked" errors for each.
+
+Usage:
+    python bench_sqlite_profile.py
+    python bench_sqlite_profile.py --writers 4 --readers 16 --seconds 20
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+from settings import PROFILES, set_sqlite_pragmas
+
+SCHEMA = [
+    "CREATE TABLE journal_entries (entry_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+    "datetime_created DATETIME NOT NULL, title VARCHAR, summary VARCHAR, transcription VARCHAR, key_insights VARCHAR)",
+    "CREATE INDEX ix_journal_entries_user_id_datetime_created ON journal_entries (user_id, datetime_created)",
+]
+INSERT = text(
+    "INSERT INTO journal_entries (user_id, datetime_created, title, summary, transcription, key_insights) "
+    "VALUES (1, :created, 'Entry', 'A short summary of the day.', :transcription, '- one')"
+)
+SELECT = text(
+    "SELECT entry_id, title, datetime_created FROM journal_entries WHERE user_id = 1 "
+    "ORDER BY datetime_created DESC LIMIT 20"
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite profiles under concurrent load")
+    parser.add_argument("--writers", type=int, default=4, help="threads inserting entries")
+    parser.add_argument("--readers", type=int, default=8, help="threads listing entries")
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration per profile")
+    parser.add_argument("--seed-rows", type=int, default=20_000, help="entries present before the run")
+    return parser.parse_args()
+
+
+def make_engine(path, profile):
+    engine = create_engine(f"sqlite:///{path}", **profile["engine_options"])
+    if profile["pragmas"]:
+        event.listen(engine, "connect", lambda dbapi_connection, _: set_sqlite_pragmas(dbapi_connection, profile["pragmas"]))
+    return engine
+
+
+def run_profile(name, args):
+    profile = PROFILES[name]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(os.path.join(tmp, "bench.db"), profile)
+        with engine.begin() as connection:
+            for statement in SCHEMA:
+                connection.execute(text(statement))
+            connection.execute(INSERT, [
+                {"created": datetime.now(), "transcription": "Transcript text. " * 20}
+            ] * args.seed_rows)
+
+        latencies = {"write": [], "read": []}
+        errors = {"write": 0, "read": 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def loop(kind):
+            while not stop.is_set():
+                started_at = time.perf_counter()
+                try:
+                    if kind == "write":
+                        with engine.begin() as connection:
+                            connection.execute(INSERT, {"created": datetime.now(), "transcription": "Transcript text. " * 20})
+                    else:
+                        with engine.connect() as connection:
+                            connection.execute(SELECT).fetchall()
+                except OperationalError:
+                    with lock:
+                        errors[kind] += 1
+                    continue
+                elapsed = time.perf_counter() - started_at
+                with lock:
+                    latencies[kind].append(elapsed)
+
+        threads = [threading.Thread(target=loop, args=("write",)) for _ in range(args.writers)]
+        threads += [threading.Thread(target=loop, args=("read",)) for _ in range(args.readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    results = {}
+    for kind in ("write", "read"):
+        samples = sorted(latencies[kind])
+        p95 = samples[int(len(samples) * 0.95)] * 1000 if samples else float("nan")
+        results[kind] = (len(samples) / args.seconds, statistics.median(samples) * 1000 if samples else float("nan"), p95, errors[kind])
+    return results
+
+
+def main():
+    args = parse_args()
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:.0f}s per profile\n")
+    all_results = {name: run_profile(name, args) for name in PROFILES}
+    for name, results in all_results.items():
+        print(name)
+        for kind, (per_second, p50, p95, error_count) in results.items():
+            print(f"  {kind:<5} {per_second:9.1f}/s  p50 {p50:8.2f} ms  p95 {p95:8.2f} ms  locked errors {error_count}")
+        print()
+    for kind in ("write", "read"):
+        before, after = all_results["development"][kind][0], all_results["production"][kind][0]
+        if before:
+            print(f"{kind} throughput: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
 from datetime import datetime
+from migrations import JOURNAL_ENTRIES_FTS
 
 
 
@@ -31,7 +33,11 @@ class JournalEntry(db.Model):
     Has a one-to-many relationship with users
     """
     __tablename__ = "journal_entries"
-    __table_args__ = {'sqlite_autoincrement': True}
+    __table_args__ = (
+        # Kept in step with migrations.py, which adds it to existing databases
+        db.Index("ix_journal_entries_user_id_datetime_created", "user_id", "datetime_created"),
+        {'sqlite_autoincrement': True},
+    )
     
     entry_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -39,9 +45,11 @@ class JournalEntry(db.Model):
     
     # Add after analysis
     title = db.Column(db.String, nullable=True, default="N/A")
-    summary = db.Column(db.String, nullable=True, default="N/A")
-    transcription = db.Column(db.String, nullable=True, default="N/A")
-    key_insights = db.Column(db.String, nullable=True, default="N/A")
+    # The large text columns are only loaded when accessed (or with undefer_group("content")),
+    # so list queries don't read whole transcripts
+    summary = db.deferred(db.Column(db.String, nullable=True, default="N/A"), group="content")
+    transcription = db.deferred(db.Column(db.String, nullable=True, default="N/A"), group="content")
+    key_insights = db.deferred(db.Column(db.String, nullable=True, default="N/A"), group="content")
     
     # Add relationship to user
     user = db.relationship("User", back_populates="journal_entries")
@@ -54,15 +62,93 @@ class JournalEntry(db.Model):
         self.transcription = kwargs.get("transcription", "N/A")
         self.key_insights = kwargs.get("key_insights", "N/A")
 
+    FIELDS = ("entry_id", "user_id", "title", "datetime_created", "transcription", "summary", "key_insights", "status")
+    # The large text columns, deferred as the "content" group
+    CONTENT_FIELDS = ("transcription", "summary", "key_insights")
+    # What list views need
+    LIST_FIELDS = ("entry_id", "title", "datetime_created", "status")
+
+    def serialize(self, status="done", fields=FIELDS):
+        """Only the requested fields are read, so deferred columns that aren't asked for stay unloaded."""
+        values = {"status": lambda: status}
+        return {field: values[field]() if field in values else getattr(self, field) for field in fields}
+
+
+# The full-text index and its triggers live outside the ORM; create them with the table
+# on new databases (existing ones get them from the migrations)
+for statement in JOURNAL_ENTRIES_FTS:
+    event.listen(JournalEntry.__table__, "after_create", DDL(statement))
+
+
+class Job(db.Model):
+    """
+    Durable work item for one pipeline stage of a journal entry.
+    Workers claim a job by taking a lease; a job whose lease expires (the worker died)
+    is claimed again. Failed attempts are retried with backoff up to max_attempts.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        db.Index("ix_jobs_state_run_after", "state", "run_after"),
+        db.Index("ix_jobs_entry_id_state", "entry_id", "state"),
+    )
+    QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    entry_id = db.Column(db.Integer, db.ForeignKey("journal_entries.entry_id"), nullable=False)
+    stage = db.Column(db.String, nullable=False)  # transcribe or analyze
+    state = db.Column(db.String, nullable=False, default=QUEUED)
+    payload = db.Column(db.String, nullable=True)  # JSON arguments for the stage
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False)
+    lease_owner = db.Column(db.String, nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    error = db.Column(db.String, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __init__(self, **kwargs):
+        now = datetime.now()
+        self.entry_id = kwargs.get("entry_id")
+        self.stage = kwargs.get("stage")
+        self.state = self.QUEUED
+        self.payload = kwargs.get("payload")
+        self.attempts = 0
+        self.max_attempts = kwargs.get("max_attempts", 3)
+        self.run_after = now
+        self.created_at = now
+        self.updated_at = now
+
+    @classmethod
+    def entry_statuses(cls, entry_ids):
+        """
+        Status of each entry derived from its jobs: "failed" if a stage gave up,
+        "processing" while any stage is queued or running, otherwise "done".
+        """
+        statuses = {entry_id: "done" for entry_id in entry_ids}
+        rows = (
+            db.session.query(cls.entry_id, cls.state)
+            .filter(cls.entry_id.in_(entry_ids), cls.state != cls.SUCCEEDED)
+            .all()
+        )
+        for entry_id, state in rows:
+            if state == cls.FAILED:
+                statuses[entry_id] = "failed"
+            elif statuses[entry_id] != "failed":
+                statuses[entry_id] = "processing"
+        return statuses
+
     def serialize(self):
         return {
+            "id": self.id,
             "entry_id": self.entry_id,
-            "user_id": self.user_id,
-            "title": self.title,
-            "datetime_created": self.datetime_created,
-            "transcription": self.transcription,
-            "summary": self.summary,
-            "key_insights": self.key_insights,
+            "stage": self.stage,
+            "state": self.state,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
         }
     
     
@@ -0,0 +1,134 @@
+"""
+Versioned schema migrations for the journal database.
+
+Every migration has an increasing version and a list of SQL statements. Applied versions
+are recorded in the schema_migrations table; pending ones run in order inside one
+transaction that holds SQLite's write lock, so processes starting at the same time (the
+API and several workers) never apply a migration twice.
+
+app.py applies pending migrations at startup. A brand new database gets the current
+schema from db.create_all() and is only stamped with the latest version; db.py attaches
+JOURNAL_ENTRIES_FTS to create_all for that reason.
+
+Usage:
+    python migrations.py status
+    python migrations.py upgrade
+    python migrations.py upgrade --db path/to/data.db
+"""
+import argparse
+import os
+import sqlite3
+from datetime import datetime
+
+DEFAULT_DB = os.path.join(os.path.dirname(__file__), "instance", "data.db")
+
+# Full-text index over the entries' text. An external-content FTS5 table stores only the
+# index and reads the text from journal_entries; the triggers keep it in step on every write.
+# Words are indexed as written (no stemming), so a partial word typed as a prefix query
+# matches; prefix indexes keep those queries fast.
+JOURNAL_ENTRIES_FTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS journal_entries_fts USING fts5("
+    "title, summary, transcription, key_insights, "
+    "content='journal_entries', content_rowid='entry_id', tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')",
+    # Rank matches in the title highest, then key insights, summary and transcript
+    "INSERT INTO journal_entries_fts (journal_entries_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 1.0, 4.0)')",
+    "CREATE TRIGGER IF NOT EXISTS journal_entries_fts_insert AFTER INSERT ON journal_entries BEGIN "
+    "INSERT INTO journal_entries_fts (rowid, title, summary, transcription, key_insights) "
+    "VALUES (new.entry_id, new.title, new.summary, new.transcription, new.key_insights); END",
+    "CREATE TRIGGER IF NOT EXISTS journal_entries_fts_delete AFTER DELETE ON journal_entries BEGIN "
+    "INSERT INTO journal_entries_fts (journal_entries_fts, rowid, title, summary, transcription, key_insights) "
+    "VALUES ('delete', old.entry_id, old.title, old.summary, old.transcription, old.key_insights); END",
+    # Only when indexed text changes, so reassigning an entry's user doesn't touch the index
+    "CREATE TRIGGER IF NOT EXISTS journal_entries_fts_update "
+    "AFTER UPDATE OF title, summary, transcription, key_insights ON journal_entries BEGIN "
+    "INSERT INTO journal_entries_fts (journal_entries_fts, rowid, title, summary, transcription, key_insights) "
+    "VALUES ('delete', old.entry_id, old.title, old.summary, old.transcription, old.key_insights); "
+    "INSERT INTO journal_entries_fts (rowid, title, summary, transcription, key_insights) "
+    "VALUES (new.entry_id, new.title, new.summary, new.transcription, new.key_insights); END",
+]
+
+# (version, name, statements). Append new migrations to the end, never edit applied ones.
+MIGRATIONS = [
+    (1, "journal_entries_user_id_datetime_created_index", [
+        # Serves per-user listing, date ranges and newest-first ordering without a table scan
+        "CREATE INDEX IF NOT EXISTS ix_journal_entries_user_id_datetime_created "
+        "ON journal_entries (user_id, datetime_created)",
+    ]),
+    (2, "jobs_indexes", [
+        # Workers claiming the next due job
+        "CREATE INDEX IF NOT EXISTS ix_jobs_state_run_after ON jobs (state, run_after)",
+        # Covers the per-entry status lookup
+        "CREATE INDEX IF NOT EXISTS ix_jobs_entry_id_state ON jobs (entry_id, state)",
+    ]),
+    (3, "journal_entries_fts", JOURNAL_ENTRIES_FTS + [
+        # Index the entries that already exist
+        "INSERT INTO journal_entries_fts (journal_entries_fts) VALUES ('rebuild')",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def applied_versions(connection):
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations "
+        "(version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)"
+    )
+    return {version for (version,) in connection.execute("SELECT version FROM schema_migrations")}
+
+
+def upgrade(connection, stamp_only=False):
+    """
+    Apply pending migrations to a sqlite3 connection; returns the versions applied.
+    With stamp_only the migrations are recorded without running them, for a schema
+    that create_all() has just built in its current form.
+    """
+    isolation_level = connection.isolation_level
+    connection.isolation_level = None  # manage the transaction ourselves
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            done = applied_versions(connection)
+            pending = [migration for migration in MIGRATIONS if migration[0] not in done]
+            for version, name, statements in pending:
+                if not stamp_only:
+                    for statement in statements:
+                        connection.execute(statement)
+                connection.execute(
+                    "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                    (version, name, datetime.now().isoformat())
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+    finally:
+        connection.isolation_level = isolation_level
+    return [version for version, _, _ in pending]
+
+
+def status(connection):
+    done = applied_versions(connection)
+    return [(version, name, version in done) for version, name, _ in MIGRATIONS]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Manage the journal database schema")
+    parser.add_argument("command", choices=["status", "upgrade"])
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite database file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not os.path.exists(args.db):
+        raise SystemExit(f"No database at {args.db}; start app.py once to create it")
+    connection = sqlite3.connect(args.db)
+    try:
+        if args.command == "upgrade":
+            applied = upgrade(connection)
+            print(f"Applied migrations: {applied}" if applied else "Database is up to date")
+        for version, name, is_applied in status(connection):
+            print(f"{version:>4}  {'applied' if is_applied else 'pending':<8} {name}")
+    finally:
+        connection.close()
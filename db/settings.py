@@ -0,0 +1,57 @@
+"""
+Persistence profiles for the journal database, selected with DB_PROFILE.
+
+development (default): SQLAlchemy echo, debug logging and a read-back check after writes.
+production: WAL journal, synchronous=NORMAL, a busy timeout and memory-mapped reads applied
+            to every connection, a pooled engine, info logging and no read-back.
+"""
+import os
+from sqlalchemy.pool import QueuePool
+
+PROFILES = {
+    "development": {
+        "echo": True,
+        "log_level": "DEBUG",
+        "verify_writes": True,
+        "pragmas": {},
+        "engine_options": {},
+    },
+    "production": {
+        "echo": False,
+        "log_level": "INFO",
+        "verify_writes": False,
+        "pragmas": {
+            # Readers don't block the writer and the writer doesn't block readers
+            "journal_mode": "WAL",
+            # Durable across application crashes; only an OS crash can lose the last commits
+            "synchronous": "NORMAL",
+            # Wait for the write lock instead of failing with "database is locked"
+            "busy_timeout": int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000")),
+            "mmap_size": int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+            "temp_store": "MEMORY",
+        },
+        "engine_options": {
+            # SQLAlchemy 1.4 opens a new SQLite connection per checkout by default; reuse them instead
+            "poolclass": QueuePool,
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+            "max_overflow": int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),
+            "pool_timeout": 30,
+            "connect_args": {"check_same_thread": False},
+        },
+    },
+}
+
+DB_PROFILE = os.getenv("DB_PROFILE", "development")
+if DB_PROFILE not in PROFILES:
+    raise ValueError(f"DB_PROFILE must be one of {list(PROFILES)}, got {DB_PROFILE}")
+profile = PROFILES[DB_PROFILE]
+
+
+def set_sqlite_pragmas(dbapi_connection, pragmas):
+    """Apply pragmas to a new DB-API connection (use from an engine "connect" event)."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py creates its database at import time, so point it at a throwaway instance first
+os.environ["DB_INSTANCE_PATH"] = tempfile.mkdtemp(prefix="journal-tests-")
+# The service modules use flat imports (they run from db/), so do the same here
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import app, db  # noqa: E402
+from db import Job, JournalEntry  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    with app.app_context():
+        Job.query.delete()
+        JournalEntry.query.delete()
+        db.session.commit()
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def make_entry():
+    """Insert an entry for the default user directly; returns its id."""
+    def make(**fields):
+        with app.app_context():
+            user_id = fields.pop("user_id", 1)
+            entry = JournalEntry(user_id=user_id, **fields)
+            db.session.add(entry)
+            db.session.commit()
+            return entry.entry_id
+    return make
@@ -0,0 +1,116 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from db import JournalEntry
+
+
+def body(response):
+    return json.loads(response.data)
+
+
+def test_delete_returns_the_deleted_entry(client, make_entry):
+    entry_id = make_entry(title="Walk", transcription="A long walk by the lake")
+
+    response = client.delete(f"/api/journal_entries/{entry_id}/")
+
+    assert response.status_code == 200
+    assert body(response)["deleted_entry"]["transcription"] == "A long walk by the lake"
+    assert client.get(f"/api/journal_entries/{entry_id}/").status_code == 404
+
+
+def test_delete_unknown_entry_is_404(client):
+    assert client.delete("/api/journal_entries/999999/").status_code == 404
+
+
+def list_entries(client, **params):
+    response = client.get("/api/journal_entries/", query_string=params)
+    return response.status_code, body(response)
+
+
+def test_list_pages_newest_first_with_cursor(client, make_entry):
+    start = datetime(2024, 1, 1)
+    # Two entries share a timestamp, so the cursor has to break ties on entry_id
+    created = [start, start + timedelta(hours=1), start + timedelta(hours=1), start + timedelta(hours=2), start + timedelta(hours=3)]
+    entry_ids = [make_entry(title=f"Entry {i}", datetime_created=at) for i, at in enumerate(created)]
+    expected = sorted(zip(created, entry_ids), reverse=True)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        status, page = list_entries(client, **params)
+        assert status == 200
+        assert len(page["entries"]) <= 2
+        seen += [entry["entry_id"] for entry in page["entries"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [entry_id for _, entry_id in expected]
+
+
+def test_last_full_page_has_no_next_cursor(client, make_entry):
+    make_entry(title="One")
+    make_entry(title="Two")
+
+    status, page = list_entries(client, limit=2)
+
+    assert status == 200
+    assert len(page["entries"]) == 2
+    assert page["next_cursor"] is None
+
+
+def test_list_only_returns_the_current_users_entries(client, make_entry):
+    make_entry(title="Mine")
+    make_entry(title="Someone else's", user_id=2)
+
+    _, page = list_entries(client)
+
+    assert [entry["title"] for entry in page["entries"]] == ["Mine"]
+
+
+@pytest.mark.parametrize("params", [{"cursor": "not-a-cursor"}, {"limit": "ten"}])
+def test_list_rejects_invalid_cursor_or_limit(client, params):
+    status, _ = list_entries(client, **params)
+    assert status == 400
+
+
+def test_list_returns_the_light_projection_by_default(client, make_entry):
+    make_entry(title="Walk", transcription="A long walk by the lake", summary="Walked")
+
+    _, page = list_entries(client)
+
+    assert set(page["entries"][0]) == set(JournalEntry.LIST_FIELDS)
+
+
+@pytest.mark.parametrize("fields, expected", [
+    ("entry_id,summary", {"entry_id", "summary"}),
+    ("all", set(JournalEntry.FIELDS)),
+])
+def test_list_returns_the_requested_fields(client, make_entry, fields, expected):
+    make_entry(title="Walk", transcription="A long walk by the lake", summary="Walked")
+
+    status, page = list_entries(client, fields=fields)
+
+    assert status == 200
+    assert set(page["entries"][0]) == expected
+    if "summary" in expected:
+        assert page["entries"][0]["summary"] == "Walked"
+
+
+def test_list_rejects_unknown_fields(client, make_entry):
+    make_entry(title="Walk")
+
+    status, _ = list_entries(client, fields="title,password")
+
+    assert status == 400
+
+
+def test_detail_returns_every_field(client, make_entry):
+    entry_id = make_entry(title="Walk", transcription="A long walk by the lake")
+
+    entry = body(client.get(f"/api/journal_entries/{entry_id}/"))
+
+    assert set(entry) == set(JournalEntry.FIELDS)
+    assert entry["transcription"] == "A long walk by the lake"
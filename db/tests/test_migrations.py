@@ -0,0 +1,58 @@
+import sqlite3
+
+import pytest
+
+import migrations
+
+# journal_entries and jobs as db.create_all() built them before any migration
+BASE_SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at DATETIME NOT NULL);
+CREATE TABLE journal_entries (
+    entry_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, datetime_created DATETIME NOT NULL,
+    title VARCHAR, summary VARCHAR, transcription VARCHAR, key_insights VARCHAR
+);
+CREATE TABLE jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, entry_id INTEGER NOT NULL, stage VARCHAR NOT NULL, state VARCHAR NOT NULL,
+    payload VARCHAR, attempts INTEGER NOT NULL, max_attempts INTEGER NOT NULL, run_after DATETIME NOT NULL,
+    lease_owner VARCHAR, lease_expires_at DATETIME, error VARCHAR, created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL
+);
+"""
+
+
+@pytest.fixture
+def connection(tmp_path):
+    connection = sqlite3.connect(tmp_path / "data.db")
+    connection.executescript(BASE_SCHEMA)
+    connection.execute(
+        "INSERT INTO journal_entries (user_id, datetime_created, title, transcription) "
+        "VALUES (1, '2025-01-01 10:00:00', 'Morning run', 'Went running by the river')"
+    )
+    connection.commit()
+    yield connection
+    connection.close()
+
+
+def indexes(connection):
+    return {name for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def matches(connection, query):
+    return connection.execute(
+        "SELECT rowid FROM journal_entries_fts WHERE journal_entries_fts MATCH ?", (query,)
+    ).fetchall()
+
+
+def test_upgrade_applies_every_migration_once(connection):
+    assert migrations.upgrade(connection) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert {"ix_journal_entries_user_id_datetime_created", "ix_jobs_state_run_after", "ix_jobs_entry_id_state"} <= indexes(connection)
+    # Existing entries are indexed for search
+    assert matches(connection, '"runn"*') == [(1,)]
+
+    assert migrations.upgrade(connection) == []
+    assert all(applied for _, _, applied in migrations.status(connection))
+
+
+def test_stamp_only_records_without_running(connection):
+    assert migrations.upgrade(connection, stamp_only=True) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert "ix_jobs_state_run_after" not in indexes(connection)
+    assert migrations.upgrade(connection) == []
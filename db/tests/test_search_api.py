@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+import app as journal_api
+
+
+def search(client, q, **params):
+    response = client.get("/api/journal_entries/search/", query_string={"q": q, **params})
+    return response.status_code, json.loads(response.data)
+
+
+@pytest.fixture
+def entries(client, make_entry):
+    return {
+        "run": make_entry(title="Morning run", transcription="I went running by the river before work"),
+        "happy": make_entry(title="Good news", summary="Felt pure happiness after the call"),
+        "budget": make_entry(title="Work day", transcription="Long meeting about the <b>budget</b>"),
+    }
+
+
+def result_ids(body):
+    return [result["entry_id"] for result in body["results"]]
+
+
+@pytest.mark.parametrize("q, expected", [
+    ("running", "run"),
+    ("runn", "run"),
+    ("happin", "happy"),
+    ("happiness", "happy"),
+    ("river runn", "run"),
+    ("budg", "budget"),
+])
+def test_whole_and_partial_words_match(client, entries, q, expected):
+    status, body = search(client, q)
+    assert status == 200
+    assert result_ids(body) == [entries[expected]]
+
+
+def test_only_the_last_word_is_a_prefix(client, entries):
+    assert search(client, "runn river")[1]["results"] == []
+
+
+def test_all_words_must_match(client, entries):
+    assert search(client, "running budget")[1]["results"] == []
+
+
+def test_fts_syntax_is_searched_as_plain_words(client, entries):
+    status, body = search(client, 'budget OR "NEAR(')
+    assert status == 200
+    assert body["results"] == []
+    assert search(client, '(("')[0] == 400
+
+
+def test_snippet_is_escaped_and_highlighted(client, entries):
+    (result,) = search(client, "budget")[1]["results"]
+    assert result["snippet"] == "Long meeting about the &lt;b&gt;<mark>budget</mark>&lt;/b&gt;"
+    assert result["rank"] is not None
+    assert set(result) == {"entry_id", "title", "datetime_created", "status", "snippet", "rank"}
+
+
+def test_index_follows_updates_and_deletes(client, entries):
+    client.post(f"/api/journal_entries/{entries['budget']}/", json={
+        "title": "Work day", "summary": "", "transcription": "Planning the offsite", "key_insights": ""
+    })
+    assert search(client, "budget")[1]["results"] == []
+    assert result_ids(search(client, "offsite")[1]) == [entries["budget"]]
+
+    client.delete(f"/api/journal_entries/{entries['run']}/")
+    assert search(client, "running")[1]["results"] == []
+
+
+def test_unselective_queries_come_back_newest_first(client, entries, monkeypatch):
+    monkeypatch.setattr(journal_api, "SEARCH_CANDIDATES", 1)
+    body = search(client, "the")[1]
+    assert result_ids(body) == [entries["budget"], entries["happy"], entries["run"]]
+    assert all(result["rank"] is None for result in body["results"])
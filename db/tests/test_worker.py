@@ -0,0 +1,171 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+import worker
+from app import app, db
+from db import Job, JournalEntry
+
+
+class FakeServer:
+    """Answers the FastAPI stage endpoints with canned responses."""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def post(self, path, **kwargs):
+        status_code, payload = self.responses[path]
+        return httpx.Response(status_code, json=payload, request=httpx.Request("POST", f"http://fastapi{path}"))
+
+
+@pytest.fixture
+def app_context(client):
+    with app.app_context():
+        yield
+
+
+def upload(client, data=b"RIFF fake wav", filename="audio_1.wav"):
+    return client.post(
+        "/api/journal_entries/audio/",
+        query_string={"filename": filename},
+        data=data,
+        headers={"Content-Type": "application/octet-stream"}
+    )
+
+
+def test_audio_upload_creates_entry_and_transcribe_job(client):
+    response = upload(client)
+
+    assert response.status_code == 202
+    entry = json.loads(response.data)
+    assert entry["status"] == "processing"
+    (job,) = json.loads(client.get(f"/api/journal_entries/{entry['entry_id']}/jobs/").data)
+    assert (job["stage"], job["state"], job["attempts"]) == ("transcribe", Job.QUEUED, 0)
+    with app.app_context():
+        payload = json.loads(db.session.get(Job, job["id"]).payload)
+    assert os.path.exists(payload["audio_path"])
+
+
+def test_jobs_of_another_users_entry_are_not_found(client, make_entry):
+    entry_id = make_entry(user_id=2)
+
+    assert client.get(f"/api/journal_entries/{entry_id}/jobs/").status_code == 404
+
+
+@pytest.mark.parametrize("data, filename", [(b"RIFF fake wav", "notes.txt"), (b"", "audio_1.wav")])
+def test_audio_upload_rejects_bad_recordings(client, data, filename):
+    assert upload(client, data, filename).status_code == 400
+    with app.app_context():
+        assert Job.query.count() == 0
+
+
+def test_claim_job_leases_each_job_once(app_context, make_entry):
+    db.session.add(Job(entry_id=make_entry(), stage="analyze"))
+    db.session.commit()
+
+    job = worker.claim_job(db, Job, "worker-a", lease_seconds=60)
+
+    assert (job.state, job.lease_owner, job.attempts) == (Job.RUNNING, "worker-a", 1)
+    assert worker.claim_job(db, Job, "worker-b", lease_seconds=60) is None
+
+
+def test_claim_job_reclaims_an_expired_lease(app_context, make_entry):
+    db.session.add(Job(entry_id=make_entry(), stage="analyze"))
+    db.session.commit()
+    job = worker.claim_job(db, Job, "worker-a", lease_seconds=60)
+    job.lease_expires_at = datetime.now() - timedelta(seconds=1)
+    db.session.commit()
+
+    reclaimed = worker.claim_job(db, Job, "worker-b", lease_seconds=60)
+
+    assert (reclaimed.id, reclaimed.lease_owner, reclaimed.attempts) == (job.id, "worker-b", 2)
+
+
+def test_transcribe_then_analyze_completes_the_entry(client):
+    entry_id = json.loads(upload(client).data)["entry_id"]
+    server = FakeServer({
+        "/api/transcribe/upload": (200, {"transcription": "I went for a run"}),
+        "/analyze/entry/": (200, {"title": "Run", "summary": "You ran", "key_points": "- running"}),
+    })
+
+    with app.app_context():
+        audio_path = json.loads(Job.query.filter_by(entry_id=entry_id).one().payload)["audio_path"]
+        for stage in ("transcribe", "analyze"):
+            job = worker.claim_job(db, Job, "worker-a", lease_seconds=60)
+            assert job.stage == stage
+            assert worker.complete_job(db, Job, JournalEntry, job, "worker-a", server)
+
+        entry = db.session.get(JournalEntry, entry_id)
+        assert (entry.transcription, entry.title, entry.summary, entry.key_insights) == (
+            "I went for a run", "Run", "You ran", "- running"
+        )
+        assert Job.entry_statuses([entry_id]) == {entry_id: "done"}
+    # The recording is only needed until it has been transcribed
+    assert not os.path.exists(audio_path)
+
+
+def test_complete_job_does_nothing_once_the_lease_is_lost(app_context, make_entry):
+    entry_id = make_entry(transcription="I went for a run")
+    db.session.add(Job(entry_id=entry_id, stage="analyze"))
+    db.session.commit()
+    job = worker.claim_job(db, Job, "worker-a", lease_seconds=60)
+    server = FakeServer({"/analyze/entry/": (200, {"title": "Run", "summary": "You ran", "key_points": "- running"})})
+
+    assert not worker.complete_job(db, Job, JournalEntry, job, "worker-b", server)
+    assert db.session.get(JournalEntry, entry_id).title == "N/A"
+    assert db.session.get(Job, job.id).state == Job.RUNNING
+
+
+def test_failed_attempts_back_off_then_give_up(app_context, make_entry):
+    entry_id = make_entry()
+    db.session.add(Job(entry_id=entry_id, stage="analyze", max_attempts=2))
+    db.session.commit()
+
+    job = worker.claim_job(db, Job, "worker-a", lease_seconds=60)
+    assert not worker.fail_job(db, Job, job, "worker-a", RuntimeError("503"), permanent=False)
+    db.session.refresh(job)
+    assert job.state == Job.QUEUED
+    assert job.run_after > datetime.now() + timedelta(seconds=worker.RETRY_BASE_SECONDS / 2)
+    assert Job.entry_statuses([entry_id]) == {entry_id: "processing"}
+
+    job.run_after = datetime.now()
+    db.session.commit()
+    job = worker.claim_job(db, Job, "worker-a", lease_seconds=60)
+    assert worker.fail_job(db, Job, job, "worker-a", RuntimeError("503"), permanent=False)
+    db.session.refresh(job)
+    assert (job.state, job.error) == (Job.FAILED, "503")
+    assert Job.entry_statuses([entry_id]) == {entry_id: "failed"}
+
+
+def test_permanent_failure_gives_up_at_once(app_context, make_entry):
+    db.session.add(Job(entry_id=make_entry(), stage="analyze"))
+    db.session.commit()
+    job = worker.claim_job(db, Job, "worker-a", lease_seconds=60)
+
+    assert worker.fail_job(db, Job, job, "worker-a", worker.PermanentJobError("bad input"), permanent=True)
+    db.session.refresh(job)
+    assert job.state == Job.FAILED
+
+
+def test_giving_up_on_a_transcribe_job_deletes_the_recording(client):
+    upload(client)
+
+    with app.app_context():
+        job = worker.claim_job(db, Job, "worker-a", lease_seconds=60)
+        audio_path = json.loads(job.payload)["audio_path"]
+        assert worker.fail_job(db, Job, job, "worker-a", worker.PermanentJobError("no speech"), permanent=True)
+    assert not os.path.exists(audio_path)
+
+
+@pytest.mark.parametrize("status_code, error", [
+    (429, RuntimeError),
+    (503, RuntimeError),
+    (422, worker.PermanentJobError),
+])
+def test_check_response_separates_retryable_errors(status_code, error):
+    response = httpx.Response(status_code, text="nope", request=httpx.Request("POST", "http://fastapi/analyze/entry/"))
+    with pytest.raises(error):
+        worker.check_response(response)
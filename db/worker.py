@@ -0,0 +1,247 @@
+"""
+Worker processes for the durable entry processing queue (the jobs table).
+
+A worker claims the oldest runnable job by taking a time-limited lease on it, runs the
+job's stage against the FastAPI service and records the result in the same transaction
+that completes the job. A transcribe job stores the transcript and queues an analyze job;
+an analyze job stores the title, summary and key insights. Failed attempts are retried
+with exponential backoff, and a job whose worker died is claimed again once its lease
+expires, so queued work survives restarts. Start more workers for more throughput.
+
+Usage:
+    python worker.py --workers 4
+    python worker.py --server-url http://fastapi:8000
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+SERVER_URL = os.getenv("SERVER_URL", "http://localhost:8000")
+# Transcribing a long recording can take minutes
+STAGE_TIMEOUT_SECONDS = float(os.getenv("JOB_STAGE_TIMEOUT_SECONDS", "600"))
+RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "600"))
+
+logger = logging.getLogger("journal_worker")
+
+
+class PermanentJobError(Exception):
+    """A failure retrying will not fix (bad input, rejected request)."""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Process queued journal entry jobs")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes to run")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds to wait when the queue is empty")
+    parser.add_argument("--lease-seconds", type=float, default=120.0, help="how long a claimed job stays reserved without a heartbeat")
+    parser.add_argument("--server-url", default=SERVER_URL, help="FastAPI service that runs the pipeline stages")
+    return parser.parse_args()
+
+
+def claim_job(db, Job, lease_owner, lease_seconds):
+    """
+    Lease the next runnable job: a queued job that is due, or a running one whose lease
+    expired. A single UPDATE statement, so two workers can never claim the same job.
+    """
+    now = datetime.now()
+    next_job = (
+        db.session.query(Job.id)
+        .filter(db.or_(
+            db.and_(Job.state == Job.QUEUED, Job.run_after <= now),
+            db.and_(Job.state == Job.RUNNING, Job.lease_expires_at < now),
+        ))
+        .order_by(Job.run_after, Job.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    claimed = (
+        db.session.query(Job)
+        .filter(Job.id == next_job)
+        .update({
+            Job.state: Job.RUNNING,
+            Job.lease_owner: lease_owner,
+            Job.lease_expires_at: now + timedelta(seconds=lease_seconds),
+            Job.attempts: Job.attempts + 1,
+            Job.updated_at: now,
+        }, synchronize_session=False)
+    )
+    db.session.commit()
+    if not claimed:
+        return None
+    return Job.query.filter_by(lease_owner=lease_owner, state=Job.RUNNING).first()
+
+
+class LeaseHeartbeat:
+    """Keeps extending a job's lease while its stage runs, so only dead workers lose their jobs."""
+
+    def __init__(self, app, db, Job, job_id, lease_owner, lease_seconds):
+        self.app, self.db, self.Job = app, db, Job
+        self.job_id = job_id
+        self.lease_owner = lease_owner
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        with self.app.app_context():
+            while not self._stop.wait(self.lease_seconds / 3):
+                self.db.session.query(self.Job).filter_by(id=self.job_id, lease_owner=self.lease_owner).update({
+                    self.Job.lease_expires_at: datetime.now() + timedelta(seconds=self.lease_seconds)
+                }, synchronize_session=False)
+                self.db.session.commit()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def check_response(response):
+    if response.status_code < 400:
+        return
+    message = f"{response.status_code} from {response.request.url}: {response.text[:300]}"
+    # Rate limits and server errors are worth another attempt, other client errors are not
+    if response.status_code == 429 or response.status_code >= 500:
+        raise RuntimeError(message)
+    raise PermanentJobError(message)
+
+
+def run_transcribe(client, payload):
+    if not os.path.exists(payload["audio_path"]):
+        raise PermanentJobError(f"Recording is missing: {payload['audio_path']}")
+    with open(payload["audio_path"], "rb") as f:
+        response = client.post(
+            "/api/transcribe/upload",
+            params={"filename": payload["filename"]},
+            content=f,
+            headers={"Content-Type": "application/octet-stream"}
+        )
+    check_response(response)
+    transcription = response.json()["transcription"]
+    if not transcription.strip():
+        raise PermanentJobError("No speech detected in the recording.")
+    return transcription
+
+
+def run_analyze(client, transcription):
+    response = client.post("/analyze/entry/", json={"transcription": transcription})
+    check_response(response)
+    return response.json()
+
+
+def complete_job(db, Job, JournalEntry, job, lease_owner, client):
+    """Run the job's stage and store its result; returns False if the lease was lost meanwhile."""
+    payload = json.loads(job.payload or "{}")
+    entry = JournalEntry.query.get(job.entry_id)
+    if entry is None:
+        raise PermanentJobError(f"Entry {job.entry_id} no longer exists")
+
+    if job.stage == "transcribe":
+        entry.transcription = run_transcribe(client, payload)
+        db.session.add(Job(entry_id=job.entry_id, stage="analyze"))
+    elif job.stage == "analyze":
+        analysis = run_analyze(client, entry.transcription)
+        entry.title = analysis.get("title", "N/A")
+        entry.summary = analysis.get("summary", "N/A")
+        entry.key_insights = analysis.get("key_points", "N/A")
+    else:
+        raise PermanentJobError(f"Unknown stage: {job.stage}")
+
+    # Only the current lease holder may complete the job
+    finished = db.session.query(Job).filter_by(id=job.id, lease_owner=lease_owner).update({
+        Job.state: Job.SUCCEEDED, Job.lease_owner: None, Job.lease_expires_at: None,
+        Job.error: None, Job.updated_at: datetime.now(),
+    }, synchronize_session=False)
+    if not finished:
+        db.session.rollback()
+        return False
+    db.session.commit()
+    if job.stage == "transcribe":
+        os.remove(payload["audio_path"])
+    return True
+
+
+def fail_job(db, Job, job, lease_owner, error, permanent):
+    """Record a failed attempt: retry later with backoff, or give up."""
+    db.session.rollback()
+    now = datetime.now()
+    give_up = permanent or job.attempts >= job.max_attempts
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+    recorded = db.session.query(Job).filter_by(id=job.id, lease_owner=lease_owner).update({
+        Job.state: Job.FAILED if give_up else Job.QUEUED,
+        Job.run_after: now if give_up else now + timedelta(seconds=delay),
+        Job.lease_owner: None, Job.lease_expires_at: None,
+        Job.error: str(error)[:1000], Job.updated_at: now,
+    }, synchronize_session=False)
+    db.session.commit()
+    if give_up and recorded and job.stage == "transcribe":
+        # No attempt will read the recording again
+        audio_path = json.loads(job.payload or "{}").get("audio_path")
+        if audio_path and os.path.exists(audio_path):
+            os.remove(audio_path)
+    return give_up
+
+
+def work(worker_id, args):
+    # Imported in the worker process so every process opens its own database connections
+    import httpx
+    from app import app, db
+    from db import Job, JournalEntry
+
+    client = httpx.Client(base_url=args.server_url, timeout=STAGE_TIMEOUT_SECONDS)
+    logger.info("Worker started", extra={"worker_id": worker_id, "pid": os.getpid()})
+    try:
+        with app.app_context():
+            while True:
+                lease_owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+                job = claim_job(db, Job, lease_owner, args.lease_seconds)
+                if job is None:
+                    time.sleep(args.poll_interval)
+                    continue
+
+                started_at = time.perf_counter()
+                job_fields = {"worker_id": worker_id, "job_id": job.id, "stage": job.stage, "entry_id": job.entry_id, "attempt": job.attempts}
+                logger.debug("Job claimed", extra=job_fields)
+                try:
+                    with LeaseHeartbeat(app, db, Job, job.id, lease_owner, args.lease_seconds):
+                        completed = complete_job(db, Job, JournalEntry, job, lease_owner, client)
+                    job_fields["duration_seconds"] = round(time.perf_counter() - started_at, 3)
+                    if completed:
+                        logger.info("Job done", extra=job_fields)
+                    else:
+                        logger.warning("Job lease lost, result discarded", extra=job_fields)
+                except Exception as e:
+                    gave_up = fail_job(db, Job, job, lease_owner, e, isinstance(e, PermanentJobError))
+                    job_fields.update(duration_seconds=round(time.perf_counter() - started_at, 3), error=str(e))
+                    logger.error("Job failed" if gave_up else "Job failed, will retry", extra=job_fields)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # spawn rather than fork so no SQLite connection is shared between processes
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=work, args=(i, args), name=f"worker-{i}") for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # In-flight jobs are picked up again once their leases expire
+        for process in processes:
+            process.terminate()
+            process.join()
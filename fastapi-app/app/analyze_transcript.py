@@ -1,13 +1,26 @@
 import boto3
 import json
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 from datetime import datetime
-from botocore.exceptions import ClientError
+from botocore.exceptions import ClientError, HTTPClientError, ConnectionError as BotocoreConnectionError
 from fastapi import APIRouter
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
-from typing import Union
+from typing import Dict, List, NamedTuple, Optional, Union
+from collections import deque
 import os
+from completion_cache import CompletionCache, make_cache_key
+from resilience import AdaptiveTokenBucket, CircuitBreaker, CircuitOpenError, ResiliencePolicy
+from thisapp import metrics
+
+logger = logging.getLogger(__name__)
 
 # Add AWS credentials
 session = boto3.Session(
@@ -18,9 +31,255 @@ session = boto3.Session(
 
 region = 'us-west-2'
 modelId = 'anthropic.claude-3-5-sonnet-20241022-v2:0'
-bedrock_client = session.client(
-    service_name='bedrock-runtime',
-    region_name=region
+
+fastModelId = 'anthropic.claude-3-haiku-20240307-v1:0'
+
+# Bedrock prompt caching checkpoints. Off by default: it assumes the account has prompt
+# caching enabled for the models in PROMPT_CACHING_MODELS (Claude 3 Haiku has no support).
+# Bedrock only caches a prefix of at least PROMPT_CACHE_MIN_TOKENS (1,024 for Claude 3.5
+# Sonnet), and the static system prompts here are a few hundred tokens, so a checkpoint is
+# only placed after a prefix estimated to be long enough, in practice after long transcripts.
+PROMPT_CACHING = os.getenv('BEDROCK_PROMPT_CACHING', 'false').lower() == 'true'
+PROMPT_CACHING_MODELS = {modelId}
+PROMPT_CACHE_MIN_TOKENS = 1024
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+
+def estimate_tokens(text):
+    """Rough token count for English text, at about four characters per token."""
+    return len(text) // 4
+
+
+class ModelRoute(NamedTuple):
+    model_id: str
+    max_tokens: int
+    temperature: float
+    latency_budget_ms: Optional[float] = None  # Downgrade when the model's p95 goes above this
+    fallback_model_id: Optional[str] = None
+
+
+# Which model serves each analysis task
+MODEL_ROUTES = {
+    "default": ModelRoute(modelId, 200, 0.2),
+    "title": ModelRoute(fastModelId, 50, 0.5),
+    "key_points": ModelRoute(fastModelId, 200, 0.2),
+    # Up to 1000 characters of summary does not fit in 200 tokens
+    "summary": ModelRoute(modelId, 400, 0.2, latency_budget_ms=8000, fallback_model_id=fastModelId),
+    "entry": ModelRoute(modelId, 800, 0.2, latency_budget_ms=12000, fallback_model_id=fastModelId),
+    "chunk_notes": ModelRoute(fastModelId, 400, 0.2),
+}
+# e.g. MODEL_ROUTES_JSON='{"title": {"model_id": "...", "max_tokens": 40, "temperature": 0.7}}'
+MODEL_ROUTES.update({
+    task: ModelRoute(**route) for task, route in json.loads(os.getenv('MODEL_ROUTES_JSON', '{}')).items()
+})
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent successful call latencies per model.
+    Samples expire after window_seconds, so a model we downgraded away from
+    gets retried once its slow samples have aged out.
+    """
+
+    def __init__(self, window_seconds=300, min_samples=20, max_samples=500):
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self._samples = {}  # model_id -> deque of (recorded_at, latency_ms)
+
+    def observe(self, model_id, latency_ms):
+        samples = self._samples.setdefault(model_id, deque(maxlen=self.max_samples))
+        samples.append((time.monotonic(), latency_ms))
+
+    def p95(self, model_id):
+        """p95 latency in ms, or None without enough recent samples"""
+        samples = self._samples.get(model_id)
+        if not samples:
+            return None
+        cutoff = time.monotonic() - self.window_seconds
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        if len(samples) < self.min_samples:
+            return None
+        latencies = sorted(latency for _, latency in samples)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def snapshot(self):
+        return {model_id: {"p95_ms": self.p95(model_id), "samples": len(samples)} for model_id, samples in self._samples.items()}
+
+
+latency_tracker = LatencyTracker()
+
+def select_route(task):
+    """
+    The route for a task, with its model swapped for the fallback while the
+    primary model's observed p95 latency is over the task's budget. When neither
+    model meets the budget the faster of the two is used.
+    """
+    route = MODEL_ROUTES.get(task, MODEL_ROUTES["default"])
+    if route.latency_budget_ms and route.fallback_model_id:
+        p95 = latency_tracker.p95(route.model_id)
+        if p95 is not None and p95 > route.latency_budget_ms:
+            fallback_p95 = latency_tracker.p95(route.fallback_model_id)
+            if fallback_p95 is None or fallback_p95 < p95:
+                return route._replace(model_id=route.fallback_model_id)
+    return route
+
+
+class Completion(NamedTuple):
+    text: str
+    model_id: str
+
+
+THROTTLE_ERROR_CODES = {'ThrottlingException', 'TooManyRequestsException'}
+RETRYABLE_ERROR_CODES = THROTTLE_ERROR_CODES | {
+    'ServiceUnavailableException', 'InternalServerException', 'ModelNotReadyException', 'ModelTimeoutException'
+}
+
+def is_bedrock_throttle(err):
+    return isinstance(err, ClientError) and err.response['Error']['Code'] in THROTTLE_ERROR_CODES
+
+def is_bedrock_retryable(err):
+    if isinstance(err, ClientError):
+        return err.response['Error']['Code'] in RETRYABLE_ERROR_CODES
+    # Connection failures, read timeouts and dropped connections
+    return isinstance(err, (BotocoreConnectionError, HTTPClientError))
+
+bedrock_policy = ResiliencePolicy(
+    'bedrock',
+    is_retryable=is_bedrock_retryable,
+    is_throttle=is_bedrock_throttle,
+    max_attempts=int(os.getenv('BEDROCK_MAX_ATTEMPTS', '4')),
+    hedge_after=float(os.getenv('BEDROCK_HEDGE_AFTER_SECONDS', '0')) or None,  # Hedging is off unless set
+    bucket=AdaptiveTokenBucket(rate=float(os.getenv('BEDROCK_RATE_LIMIT_PER_SECOND', '10'))),
+    breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+)
+
+
+# Bedrock usage field -> token kind label
+USAGE_TOKEN_KINDS = {
+    'inputTokens': 'input',
+    'outputTokens': 'output',
+    'cacheReadInputTokens': 'cache_read',
+    'cacheWriteInputTokens': 'cache_write',
+}
+
+def record_usage(model_id, usage):
+    for field, kind in USAGE_TOKEN_KINDS.items():
+        if usage.get(field):
+            metrics.bedrock_tokens_total.inc(usage[field], model=model_id, kind=kind)
+
+
+class StubBedrockRuntime:
+    """
+    Offline stand-in for the bedrock-runtime client with the same converse response shape.
+    Selected with BEDROCK_BACKEND=stub for local runs and backfills.
+    """
+
+    def _reply(self, messages):
+        # Entry analysis prompts prefill "{" and expect the rest of a JSON object
+        if messages[-1]["role"] == "assistant" and messages[-1]["content"][0]["text"] == "{":
+            return '"title": "Stub title", "summary": "Stub summary.", "key_points": "- Stub key point"}'
+        return "Stub completion."
+
+    def converse(self, modelId, messages, **kwargs):
+        text = self._reply(messages)
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": text}]}},
+            "stopReason": "end_turn",
+            "usage": {"inputTokens": 0, "outputTokens": 0, "totalTokens": 0}
+        }
+
+
+class BedrockClient:
+    """
+    Runs blocking bedrock-runtime calls on a dedicated, sized thread pool.
+    A semaphore caps concurrent calls so bursts queue here instead of exhausting
+    the shared default executor, and the time spent queued is recorded.
+    """
+
+    def __init__(self, session, region_name, max_concurrency=8, read_timeout=60, backend='bedrock'):
+        self.max_concurrency = max_concurrency
+        self.client = StubBedrockRuntime() if backend == 'stub' else session.client(
+            service_name='bedrock-runtime',
+            region_name=region_name,
+            config=Config(
+                max_pool_connections=max_concurrency,
+                read_timeout=read_timeout,
+                # Retries are handled by bedrock_policy
+                retries={'max_attempts': 1, 'mode': 'standard'}
+            )
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix='bedrock'
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.stats = {"calls": 0, "in_flight": 0, "waiting": 0, "queue_wait_total_ms": 0.0, "queue_wait_max_ms": 0.0}
+
+    @asynccontextmanager
+    async def _slot(self):
+        queued_at = time.perf_counter()
+        self.stats["waiting"] += 1
+        async with self._semaphore:
+            self.stats["waiting"] -= 1
+            wait_ms = (time.perf_counter() - queued_at) * 1000
+            self.stats["calls"] += 1
+            self.stats["queue_wait_total_ms"] += wait_ms
+            self.stats["queue_wait_max_ms"] = max(self.stats["queue_wait_max_ms"], wait_ms)
+            metrics.upstream_queue_wait_seconds.observe(wait_ms / 1000, upstream='bedrock')
+            self.stats["in_flight"] += 1
+            try:
+                with metrics.upstream_requests_in_flight.track_inprogress(upstream='bedrock'):
+                    yield
+            finally:
+                self.stats["in_flight"] -= 1
+
+    async def _converse_once(self, params):
+        async with self._slot():
+            started_at = time.perf_counter()
+            try:
+                response = await asyncio.get_running_loop().run_in_executor(
+                    self._executor,
+                    lambda: self.client.converse(**params)
+                )
+            except Exception:
+                metrics.upstream_errors_total.inc(upstream='bedrock', operation='converse')
+                raise
+            finally:
+                metrics.upstream_request_duration_seconds.observe(
+                    time.perf_counter() - started_at, upstream='bedrock', operation='converse'
+                )
+            latency_tracker.observe(params['modelId'], (time.perf_counter() - started_at) * 1000)
+            record_usage(params['modelId'], response.get('usage', {}))
+            return response
+
+    async def converse(self, **params):
+        # Each attempt takes its own slot, so backoff sleeps don't hold one
+        return await bedrock_policy.call(lambda: self._converse_once(params))
+
+    def snapshot(self):
+        calls = self.stats["calls"]
+        return {
+            **self.stats,
+            "max_concurrency": self.max_concurrency,
+            "queue_wait_avg_ms": self.stats["queue_wait_total_ms"] / calls if calls else 0.0,
+        }
+
+
+bedrock_client = BedrockClient(
+    session,
+    region,
+    max_concurrency=int(os.getenv('BEDROCK_MAX_CONCURRENCY', '8')),
+    read_timeout=int(os.getenv('BEDROCK_READ_TIMEOUT_SECONDS', '60')),
+    backend=os.getenv('BEDROCK_BACKEND', 'bedrock')
+)
+
+# Cache completions so reruns, retries and re-analysis of the same entry skip Bedrock
+completion_cache = CompletionCache(
+    max_entries=int(os.getenv('COMPLETION_CACHE_MAX_ENTRIES', '1024')),
+    ttl_seconds=float(os.getenv('COMPLETION_CACHE_TTL_SECONDS', '86400')),
+    db_path=os.getenv('COMPLETION_CACHE_DB_PATH')  # Optional persistent SQLite tier
 )
 
 app = FastAPI()
@@ -33,227 +292,227 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+######################################## PROMPT ELEMENTS ########################################
+# Static prompt parts are combined once at import time. The instructions go in the system
+# block and the transcript is appended last, so every call for a task shares a cacheable prefix.
+
+TASK_CONTEXT = "You are like the users friend. You do not want to repeat what the user told you. Also talk to the user in the 2nd person."
+
+TONE_CONTEXT = "You should maintain a friendly warm and casual tone."
+
+HISTORY_INTRO = "Here is the conversational history (between the user and you) prior to the question. It could be empty if there is no history:"
+
+ENTRY_FIELDS = ("title", "summary", "key_points")
+
+ENTRY_FIELD_DESCRIPTIONS = {
+    "title": "a journal entry title that is unique and easy to pick out compared to other entries. Leave out any sensitive information like names and don't make it extreemly negative.",
+    "summary": "a brief summary of the entry noting main events and things that they placed emphasis on, categorized into topics. Do not give them advice on what to do but summarize how they've been feeling. No longer than 1000 characters.",
+    "key_points": "short key insights about the emotions the user has expressed, highlighting trends they may not have noticed. Use bullet point format, no longer than 230 characters.",
+}
+
+
+class PromptTemplate:
+    """
+    A task prompt whose static parts are built once.
+    render() only appends the transcript to the precompiled user message prefix.
+    """
+
+    def __init__(self, question, task_description, immediate_task, precognition, output_formatting, examples=None, prefill=None):
+        elements = [TASK_CONTEXT, TONE_CONTEXT, task_description, examples, immediate_task, precognition, output_formatting]
+        self.system = "\n\n".join(element.strip() for element in elements if element)
+        self.user_prefix = f"Here is the user's question:\n<question>\n{question}\n</question>\n\n{HISTORY_INTRO}\n<history>\n"
+        self.prefill = prefill
+
+    def render(self, history):
+        return self.system, self.user_prefix + str(history) + "\n</history>", self.prefill
+
+
+SUMMARY_TEMPLATE = PromptTemplate(
+    question="Can you Summarize the journal entry?",
+    task_description="I want you to write a brief summary of the the users journal entry. Noting main events and things that they placed emphasis on",
+    immediate_task="How do you respond to the user's question in a thoughtful non-biased manner? Categorize these summaries into different Topics",
+    precognition="Think about your answer first before you respond. Do not give them advice on what to do but summarize how they've been feeling.",
+    output_formatting="Start with the summary topics. Make it no longer than 1000 characters. No preamble just the thing specifically asked for. Do not do \"Here is your summary\" or anything like that."
+)
+
+KEY_POINTS_TEMPLATE = PromptTemplate(
+    question="Based on the provided summary can you generate short key insights/points?",
+    task_description="I want you to write some key insights about the emotions the user has expressed in a digestable easy to read manner.",
+    immediate_task="How do you respond to the user's question in a thoughful non biased manner?",
+    precognition="Think about your answer first before you respond. Do not give them advice on what to do but give highlight trends they may not have noticed. Focus on emotions being felt.",
+    output_formatting="Make it no longer than 230 characters. Do not format by category. Use bullet point fomrat. No preamble just the thing specifically asked for."
+)
+
+TITLE_TEMPLATE = PromptTemplate(
+    question="Generate a Title for this journal Entry?",
+    task_description="You are going to be generating a jounral entry title. That should be unique and easy to pick out compared to other entries",
+    immediate_task="Generate a Jounral Entry title",
+    precognition="Think about your answer first before you respond. Do not reveal any sensitive information. Don't make it extreemly negative.",
+    output_formatting="Leave out any sensitive information like names. No preamble just the thing specifically asked for."
+)
+
+@lru_cache(maxsize=None)
+def entry_analysis_template(fields=ENTRY_FIELDS):
+    return PromptTemplate(
+        question="Can you give this journal entry a title, a summary and some key insights?",
+        task_description="I want you to analyze the users journal entry and produce these things at once:\n" + "\n".join(
+            f"- {field}: {ENTRY_FIELD_DESCRIPTIONS[field]}" for field in fields
+        ),
+        immediate_task="How do you respond to the user's question in a thoughtful non-biased manner?",
+        precognition="Think about your answer first before you respond. Do not reveal any sensitive information.",
+        output_formatting=f"Respond with a single JSON object with exactly the string keys {', '.join(json.dumps(field) for field in fields)}. No preamble and nothing outside of the JSON object.",
+        prefill="{"
+    )
+
+# Build the full entry analysis prompt up front too
+entry_analysis_template()
+
+# Map step for long transcripts: condense one chunk into notes the task prompts can work from
+CHUNK_NOTES_TEMPLATE = PromptTemplate(
+    question="Can you write condensed notes on this part of the journal entry?",
+    task_description="The journal entry is too long to read at once, so you are only given one part of it. I want you to write condensed notes on this part that someone could later summarize from.",
+    immediate_task="Write the notes for this part only.",
+    precognition="Keep the main events, the things the user placed emphasis on and the emotions they expressed, in the order they came up. Do not give advice.",
+    output_formatting="Use short plain sentences. No preamble just the notes."
+)
+
+
 class PromptGenerator:
+    """
+    Each method returns (system prompt, user prompt, prefill) for one task.
+    """
+
     @staticmethod
     def generate_summary_prompt(HISTORY):
-        ######################################## INPUT VARIABLES ########################################
-        
-        # Second input variable - the user's question
-        QUESTION = "Can you Summarize the journal entry?"
-
-        ######################################## PROMPT ELEMENTS ########################################
-        TASK_CONTEXT = "You are like the users friend. You do not want to repeat what the user told you. Also talk to the user in the 2nd person."
-        
-        TONE_CONTEXT = "You should maintain a friendly warm and casual tone."
-        
-        TASK_DESCRIPTION = """ I want you to write a brief summary of the the users journal entry. Noting main events and things that they placed emphasis on"""
-        
-        EXAMPLES = None 
-        
-        INPUT_DATA = f"""Here is the conversational history (between the user and you) prior to the question. It could be empty if there is no history:
-        <history>
-        {HISTORY}
-        </history>
-        
-        Here is the user's question:
-        <question>
-        {QUESTION}
-        </question>"""
-        
-        IMMEDIATE_TASK = "How do you respond to the user's question in a thoughtful non-biased manner? Categorize these summaries into different Topics"
-        
-        PRECOGNITION = "Think about your answer first before you respond. Do not give them advice on what to do but summarize how they've been feeling."
-        
-        OUTPUT_FORMATTING = """ Start with the summary topics. Make it no longer than 1000 characters. No preamble just the thing specifically asked for. Do not do \"Here is your summary\" or anything like that.  """
-        
-        PREFILL = None
-
-        ######################################## COMBINE ELEMENTS ########################################
-        
-        PROMPT = ""
-        
-        if TASK_CONTEXT:
-            PROMPT += f"""{TASK_CONTEXT}"""
-        
-        if TONE_CONTEXT:
-            PROMPT += f"""\n\n{TONE_CONTEXT}"""
-        
-        if TASK_DESCRIPTION:
-            PROMPT += f"""\n\n{TASK_DESCRIPTION}"""
-        
-        if EXAMPLES:
-            PROMPT += f"""\n\n{EXAMPLES}"""
-        
-        if INPUT_DATA:
-            PROMPT += f"""\n\n{INPUT_DATA}"""
-        
-        if IMMEDIATE_TASK:
-            PROMPT += f"""\n\n{IMMEDIATE_TASK}"""
-        
-        if PRECOGNITION:
-            PROMPT += f"""\n\n{PRECOGNITION}"""
-        
-        if OUTPUT_FORMATTING:
-            PROMPT += f"""\n\n{OUTPUT_FORMATTING}"""
-        
-        return PROMPT, PREFILL
+        return SUMMARY_TEMPLATE.render(HISTORY)
 
     @staticmethod
     def generate_key_points_prompt(HISTORY):
-        ######################################## INPUT VARIABLES ########################################
-        
-        # Second input variable - the user's question
-        QUESTION = "Based on the provided summary can you generate short key insights/points?"
-
-        ######################################## PROMPT ELEMENTS ########################################
-        TASK_CONTEXT = "You are like the users friend. You do not want to repeat what the user told you. Also talk to the user in the 2nd person."
-        
-        TONE_CONTEXT = "You should maintain a friendly warm and casual tone."
-        
-        TASK_DESCRIPTION = """ I want you to write some key insights about the emotions the user has expressed in a digestable easy to read manner."""
-        
-        EXAMPLES = None 
-        
-        INPUT_DATA = f"""Here is the conversational history (between the user and you) prior to the question. It could be empty if there is no history:
-        <history>
-        {HISTORY}
-        </history>
-
-        Here is the user's question:
-        <question>
-        {QUESTION}
-        </question>"""
-        
-        IMMEDIATE_TASK = "How do you respond to the user's question in a thoughful non biased manner?"
-        
-        PRECOGNITION = "Think about your answer first before you respond. Do not give them advice on what to do but give highlight trends they may not have noticed. Focus on emotions being felt."
-        
-        OUTPUT_FORMATTING = "Make it no longer than 230 characters. Do not format by category. Use bullet point fomrat. No preamble just the thing specifically asked for."
-        
-        PREFILL = None
-
-        ######################################## COMBINE ELEMENTS ########################################
-        
-        PROMPT = ""
-        
-        if TASK_CONTEXT:
-            PROMPT += f"""{TASK_CONTEXT}"""
-        
-        if TONE_CONTEXT:
-            PROMPT += f"""\n\n{TONE_CONTEXT}"""
-        
-        if TASK_DESCRIPTION:
-            PROMPT += f"""\n\n{TASK_DESCRIPTION}"""
-        
-        if EXAMPLES:
-            PROMPT += f"""\n\n{EXAMPLES}"""
-        
-        if INPUT_DATA:
-            PROMPT += f"""\n\n{INPUT_DATA}"""
-        
-        if IMMEDIATE_TASK:
-            PROMPT += f"""\n\n{IMMEDIATE_TASK}"""
-        
-        if PRECOGNITION:
-            PROMPT += f"""\n\n{PRECOGNITION}"""
-        
-        if OUTPUT_FORMATTING:
-            PROMPT += f"""\n\n{OUTPUT_FORMATTING}"""
-        
-        return PROMPT, PREFILL
+        return KEY_POINTS_TEMPLATE.render(HISTORY)
 
     @staticmethod
     def generate_title_prompt(HISTORY):
-        ######################################## INPUT VARIABLES ########################################
-        
-        # Second input variable - the user's question
-        QUESTION = "Generate a Title for this journal Entry?"
-
-        ######################################## PROMPT ELEMENTS ########################################
-        TASK_CONTEXT = "You are like the users friend. You do not want to repeat what the user told you. Also talk to the user in the 2nd person."
-        
-        TONE_CONTEXT = "You should maintain a friendly warm and casual tone."
-        
-        TASK_DESCRIPTION = """ You are going to be generating a jounral entry title. That should be unique and easy to pick out compared to other entries"""
-        
-        EXAMPLES = None 
-        
-        INPUT_DATA = f"""Here is the conversational history (between the user and you) prior to the question. It could be empty if there is no history:
-        <history>
-        {HISTORY}
-        </history>
-
-        Here is the user's question:
-        <question>
-        {QUESTION}
-        </question>"""
-        
-        IMMEDIATE_TASK = "Generate a Jounral Entry title"
-        
-        PRECOGNITION = "Think about your answer first before you respond. Do not reveal any sensitive information. Don't make it extreemly negative. "
-        
-        OUTPUT_FORMATTING = """ Leave out any sensitive information like names. No preamble just the thing specifically asked for."""
-        
-        PREFILL = None
-
-        ######################################## COMBINE ELEMENTS ########################################
-        
-        PROMPT = ""
-        
-        if TASK_CONTEXT:
-            PROMPT += f"""{TASK_CONTEXT}"""
-        
-        if TONE_CONTEXT:
-            PROMPT += f"""\n\n{TONE_CONTEXT}"""
-        
-        if TASK_DESCRIPTION:
-            PROMPT += f"""\n\n{TASK_DESCRIPTION}"""
-        
-        if EXAMPLES:
-            PROMPT += f"""\n\n{EXAMPLES}"""
-        
-        if INPUT_DATA:
-            PROMPT += f"""\n\n{INPUT_DATA}"""
-        
-        if IMMEDIATE_TASK:
-            PROMPT += f"""\n\n{IMMEDIATE_TASK}"""
-        
-        if PRECOGNITION:
-            PROMPT += f"""\n\n{PRECOGNITION}"""
-        
-        if OUTPUT_FORMATTING:
-            PROMPT += f"""\n\n{OUTPUT_FORMATTING}"""
-        
-        return PROMPT, PREFILL
-    
-    
-async def get_completion(prompt, system_prompt=None, prefill=None):
+        return TITLE_TEMPLATE.render(HISTORY)
+
+    @staticmethod
+    def generate_entry_analysis_prompt(HISTORY, fields=ENTRY_FIELDS):
+        return entry_analysis_template(tuple(fields)).render(HISTORY)
+
+
+def build_converse_params(prompt, system_prompt=None, prefill=None, route=MODEL_ROUTES["default"]):
+    """
+    Build the Bedrock converse request for a model route and its completion cache key.
+    """
     inference_config = {
-        "temperature": 0.2,
-         "maxTokens": 200
+        "temperature": route.temperature,
+         "maxTokens": route.max_tokens
     }
+    prompt_caching = PROMPT_CACHING and route.model_id in PROMPT_CACHING_MODELS
     converse_api_params = {
-        "modelId": modelId,
+        "modelId": route.model_id,
         "messages": [{"role": "user", "content": [{"text": prompt}]}],
         "inferenceConfig": inference_config
     }
+    system_tokens = estimate_tokens(system_prompt or "")
     if system_prompt:
         converse_api_params["system"] = [{"text": system_prompt}]
+        if prompt_caching and system_tokens >= PROMPT_CACHE_MIN_TOKENS:
+            # Everything up to here is the static per-task prefix
+            converse_api_params["system"].append(CACHE_POINT)
+    if prompt_caching and system_tokens + estimate_tokens(prompt) >= PROMPT_CACHE_MIN_TOKENS:
+        # The transcript is last, so reruns on the same entry reuse the whole prompt
+        converse_api_params["messages"][0]["content"].append(CACHE_POINT)
     if prefill:
         converse_api_params["messages"].append({"role": "assistant", "content": [{"text": prefill}]})
+    cache_key = make_cache_key(route.model_id, inference_config, system_prompt, prefill, prompt)
+    return converse_api_params, cache_key
+
+async def get_completion(prompt, system_prompt=None, prefill=None, task="default"):
+    route = select_route(task)
+    converse_api_params, cache_key = build_converse_params(prompt, system_prompt, prefill, route)
+
+    async def converse():
+        response = await bedrock_client.converse(**converse_api_params)
+        return response['output']['message']['content'][0]['text']
+
     try:
-        # Use asyncio to run the blocking bedrock_client.converse call
-        response = await asyncio.get_event_loop().run_in_executor(
-            None, 
-            lambda: bedrock_client.converse(**converse_api_params)
-        )
-        text_content = response['output']['message']['content'][0]['text']
-        return text_content
+        text = await completion_cache.get_or_compute(cache_key, converse)
+        return Completion(text, route.model_id)
 
+    except CircuitOpenError as err:
+        raise HTTPException(status_code=503, detail=str(err))
     except ClientError as err:
         message = err.response['Error']['Message']
-        print(f"A client error occurred: {message}")
-        raise HTTPException(status_code=500, detail=message)
+        logger.error("A client error occurred", extra={"error_message": message})
+        # Still throttled after all retries
+        status_code = 429 if is_bedrock_throttle(err) else 500
+        raise HTTPException(status_code=status_code, detail=message)
+
+# Transcripts longer than this many (estimated) tokens are summarized map-reduce style
+TRANSCRIPT_CHUNK_TOKENS = int(os.getenv('TRANSCRIPT_CHUNK_TOKENS', '3000'))
+
+def transcript_text(transcription):
+    """
+    Pull the transcript text out of a request payload.
+    Accepts a plain string, {"text": ...} or the /api/transcribe response {"transcription": ...}.
+    """
+    while isinstance(transcription, dict):
+        if "text" in transcription:
+            transcription = transcription["text"]
+        elif "transcription" in transcription:
+            transcription = transcription["transcription"]
+        else:
+            return json.dumps(transcription)
+    return str(transcription)
+
+def split_transcript(text, max_tokens=TRANSCRIPT_CHUNK_TOKENS):
+    """
+    Split text into chunks of at most max_tokens, breaking on sentence boundaries.
+    A single sentence over the budget is split on whitespace.
+    """
+    sentences = []
+    for sentence in re.split(r'(?<=[.!?])\s+', text.strip()):
+        if estimate_tokens(sentence) <= max_tokens:
+            sentences.append(sentence)
+            continue
+        words, piece = sentence.split(), []
+        for word in words:
+            if piece and estimate_tokens(" ".join(piece + [word])) > max_tokens:
+                sentences.append(" ".join(piece))
+                piece = []
+            piece.append(word)
+        if piece:
+            sentences.append(" ".join(piece))
+
+    chunks, current, current_tokens = [], [], 0
+    for sentence in sentences:
+        tokens = estimate_tokens(sentence)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+async def condense_transcript(transcription):
+    """
+    Map step of the long transcript pipeline.
+    Short transcripts come back as plain text. Long ones are split on sentence boundaries
+    and each chunk is condensed into notes in parallel. Each chunk is cached on its own
+    content, and the task prompt then runs over the joined notes as the reduce step.
+    """
+    text = transcript_text(transcription)
+    if estimate_tokens(text) <= TRANSCRIPT_CHUNK_TOKENS:
+        return text
+
+    chunks = split_transcript(text)
+    notes = await asyncio.gather(*(
+        get_completion(prompt, system_prompt, prefill, task="chunk_notes")
+        for system_prompt, prompt, prefill in (CHUNK_NOTES_TEMPLATE.render(chunk) for chunk in chunks)
+    ))
+    return "\n\n".join(f"Notes on part {i} of {len(chunks)}:\n{note.text}" for i, note in enumerate(notes, 1))
 
 from pydantic import BaseModel
 
@@ -276,30 +535,128 @@ router = APIRouter()
 
 @router.post("/generate_summary/")
 async def generate_summary(request: TranscriptionRequest):
-    summary_prompt = PromptGenerator()
     try: 
-        prompt, prefill = summary_prompt.generate_summary_prompt(request.transcription)
-        summary = await get_completion(prompt, prefill) 
-        return {"summary": summary}
+        transcript = await condense_transcript(request.transcription)
+        system_prompt, prompt, prefill = PromptGenerator.generate_summary_prompt(transcript)
+        summary = await get_completion(prompt, system_prompt, prefill, task="summary")
+        return {"summary": summary.text, "model": summary.model_id}
+    except HTTPException:
+        raise
     except Exception as e: 
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/generate_keypoints/")
 async def generate_keypoints(request: TranscriptionRequest):
-    key_points_prompt = PromptGenerator()
     try:
-        prompt, prefill = key_points_prompt.generate_key_points_prompt(request.transcription)
-        key_points = await get_completion(prompt, prefill)
-        return {"key_points": key_points}
+        transcript = await condense_transcript(request.transcription)
+        system_prompt, prompt, prefill = PromptGenerator.generate_key_points_prompt(transcript)
+        key_points = await get_completion(prompt, system_prompt, prefill, task="key_points")
+        return {"key_points": key_points.text, "model": key_points.model_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/generate_title/")
 async def generate_title(request: TranscriptionRequest):
-    title_prompt = PromptGenerator()
     try:
-        prompt, prefill = title_prompt.generate_title_prompt(request.transcription)
-        title = await get_completion(prompt, prefill)
-        return {"title": title}
+        transcript = await condense_transcript(request.transcription)
+        system_prompt, prompt, prefill = PromptGenerator.generate_title_prompt(transcript)
+        title = await get_completion(prompt, system_prompt, prefill, task="title")
+        return {"title": title.text, "model": title.model_id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class EntryAnalysis(BaseModel):
+    title: Optional[str] = None
+    summary: Optional[str] = None
+    key_points: Optional[str] = None
+    models: Dict[str, str] = {}  # Which model produced each field
+
+class EntryAnalysisRequest(TranscriptionRequest):
+    fields: Optional[List[str]] = None  # Subset of ENTRY_FIELDS, defaults to all of them
+
+# Per-field prompt used when a field is missing from the combined response
+FIELD_PROMPTS = {
+    "title": PromptGenerator.generate_title_prompt,
+    "summary": PromptGenerator.generate_summary_prompt,
+    "key_points": PromptGenerator.generate_key_points_prompt,
+}
+
+def parse_entry_analysis(text, fields=ENTRY_FIELDS):
+    """
+    Parse the combined model response into a dict of the fields that came back valid.
+    Fields that are missing or not a non-empty string are left out.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {
+        field: data[field].strip()
+        for field in fields
+        if isinstance(data.get(field), str) and data[field].strip()
+    }
+
+async def analyze_entry(transcription, fields=ENTRY_FIELDS):
+    """
+    Generate the requested analysis fields for a transcript with a single model call.
+    Only the fields that fail to parse are regenerated with their own prompt.
+    """
+    transcript = await condense_transcript(transcription)
+    system_prompt, prompt, prefill = PromptGenerator.generate_entry_analysis_prompt(transcript, fields)
+    completion = await get_completion(prompt, system_prompt, prefill, task="entry")
+    # The prefill is not echoed back by the model
+    results = parse_entry_analysis(prefill + completion.text, fields)
+    models = {field: completion.model_id for field in results}
+
+    missing = [field for field in fields if field not in results]
+    if missing:
+        logger.warning("Combined analysis missing fields, falling back to per-field calls", extra={"missing": missing})
+        prompts = [FIELD_PROMPTS[field](transcript) for field in missing]
+        completions = await asyncio.gather(*(
+            get_completion(prompt, system_prompt, prefill, task=field)
+            for field, (system_prompt, prompt, prefill) in zip(missing, prompts)
+        ))
+        for field, field_completion in zip(missing, completions):
+            results[field] = field_completion.text
+            models[field] = field_completion.model_id
+    return EntryAnalysis(**results, models=models)
+
+@router.post("/entry/")
+async def generate_entry_analysis(request: EntryAnalysisRequest):
+    fields = tuple(request.fields or ENTRY_FIELDS)
+    unknown = set(fields) - set(ENTRY_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"fields must be a subset of {list(ENTRY_FIELDS)}")
+    try:
+        analysis = await analyze_entry(request.transcription, fields)
+        return analysis.model_dump(exclude_none=True)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return completion_cache.snapshot()
+
+@router.get("/routes")
+async def get_model_routes():
+    """The routing table, the model each task would use right now and observed p95 latencies"""
+    return {
+        "routes": {task: route._asdict() for task, route in MODEL_ROUTES.items()},
+        "selected": {task: select_route(task).model_id for task in MODEL_ROUTES},
+        "latency": latency_tracker.snapshot()
+    }
+
+@router.get("/bedrock/stats")
+async def get_bedrock_stats():
+    return bedrock_client.snapshot()
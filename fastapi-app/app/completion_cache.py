@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from single_flight import SingleFlight
+
+
+def make_cache_key(model_id, inference_config, system_prompt, prefill, prompt):
+    """
+    Build a content-addressed key for a completion request.
+    The prompt is hashed separately so long transcripts don't bloat the key material.
+    """
+    key_material = json.dumps({
+        "modelId": model_id,
+        "inferenceConfig": inference_config,
+        "system": system_prompt,
+        "prefill": prefill,
+        "prompt": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+    }, sort_keys=True)
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    Two tier cache for model completions:
+    an in-memory LRU with size and TTL eviction, backed by an optional SQLite file.
+    Concurrent requests for the same key share a single in-flight call.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, db_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._in_flight = SingleFlight()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "persistent_hits": 0, "evictions": 0}
+
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _get_memory(self, key):
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_memory(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _get_persistent(self, key):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at < time.time():
+            with self._db_lock:
+                self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._db.commit()
+            return None
+        return json.loads(value), expires_at
+
+    def _set_persistent(self, key, value, expires_at):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._db.commit()
+
+    def _promote(self, key, persisted):
+        """Keep a persistent hit in memory too; returns its value (None for a miss)."""
+        if persisted is None:
+            return None
+        value, expires_at = persisted
+        self._set_memory(key, value, expires_at)
+        self.stats["persistent_hits"] += 1
+        return value
+
+    def get(self, key):
+        value = self._get_memory(key)
+        if value is None:
+            value = self._promote(key, self._get_persistent(key))
+        return value
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl_seconds
+        self._set_memory(key, value, expires_at)
+        self._set_persistent(key, value, expires_at)
+
+    async def get_or_compute(self, key, compute):
+        """
+        Return the cached value for key, or await compute() once and cache its result.
+        Callers that arrive while compute() is running share its result.
+        The SQLite tier is read and written off the event loop.
+        """
+        value = self._get_memory(key)
+        if value is None and self._db is not None:
+            value = self._promote(key, await asyncio.to_thread(self._get_persistent, key))
+        if value is not None:
+            self.stats["hits"] += 1
+            return value
+
+        self.stats["coalesced" if key in self._in_flight else "misses"] += 1
+
+        async def compute_and_store():
+            value = await compute()
+            expires_at = time.time() + self.ttl_seconds
+            self._set_memory(key, value, expires_at)
+            if self._db is not None:
+                await asyncio.to_thread(self._set_persistent, key, value, expires_at)
+            return value
+        return await self._in_flight.run(key, compute_and_store)
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self._db is not None,
+        }
@@ -0,0 +1,100 @@
+import os
+import time
+from contextlib import contextmanager
+import httpx
+from fastapi import APIRouter, HTTPException, Request
+from analyze_transcript import analyze_entry
+from transcribe import check_acceptable_file_extension, spool_request_body, transcribe_upload_file
+from thisapp import metrics
+
+router = APIRouter()
+
+# Journal database API (the Flask service in db/)
+DB_API_URL = os.getenv('DB_API_URL', 'http://localhost:8080')
+DB_API_TIMEOUT_SECONDS = float(os.getenv('DB_API_TIMEOUT_SECONDS', '10'))
+
+# Shared client so entries are saved over pooled keep-alive connections; opened in the server lifespan
+db_client = None
+
+async def open_db_client():
+    global db_client
+    db_client = httpx.AsyncClient(
+        base_url=DB_API_URL,
+        timeout=DB_API_TIMEOUT_SECONDS,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+    )
+
+async def close_db_client():
+    global db_client
+    if db_client is not None:
+        await db_client.aclose()
+        db_client = None
+
+async def save_entry(transcription, analysis):
+    """Store the entry through the database API in the shape it expects."""
+    payload = {
+        "transcription": transcription,
+        "title": {"title": analysis.title},
+        "summary": {"summary": analysis.summary},
+        "keypoints": {"key_points": analysis.key_points},
+    }
+    try:
+        response = await db_client.post("/api/journal_entries/", json=payload)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to save entry: {e}")
+
+class StageTimer:
+    """Times each pipeline stage in milliseconds and records it in the stage histogram."""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            self.timings[name] = round(elapsed * 1000)
+            metrics.pipeline_stage_duration_seconds.observe(elapsed, stage=name)
+
+@router.post("/entries/process")
+async def process_entry(request: Request, filename: str = "audio.wav"):
+    """
+    Turn a recording into a stored journal entry in one request:
+    transcribe, analyze (title, summary and key points) and save.
+
+    The audio is the raw request body. Returns the stored entry, which model produced
+    each field and how long each stage took in milliseconds.
+
+    For clients that want the finished entry in one blocking call; the Streamlit app
+    uploads to the database API's job queue instead (db/worker.py).
+    """
+    if not check_acceptable_file_extension(filename):
+        raise HTTPException(status_code=400, detail="Unsupported file type.")
+
+    timer = StageTimer()
+    try:
+        with timer.stage("upload"):
+            audio_file, digest = await spool_request_body(request)
+        try:
+            with timer.stage("transcribe"):
+                transcription = await transcribe_upload_file(audio_file, filename, digest)
+        finally:
+            audio_file.close()
+        if not transcription.strip():
+            raise HTTPException(status_code=422, detail="No speech detected in the recording.")
+
+        with timer.stage("analyze"):
+            analysis = await analyze_entry(transcription)
+        with timer.stage("persist"):
+            entry = await save_entry(transcription, analysis)
+
+        return {"entry": entry, "models": analysis.models, "timings_ms": timer.timings}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,237 @@
+import asyncio
+import random
+import threading
+import time
+
+# Every policy created is registered here so their stats can be reported together
+policies = {}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while a circuit breaker is open."""
+
+
+class AdaptiveTokenBucket:
+    """
+    Client-side rate limiter. The refill rate is halved on every throttle response
+    and creeps back up additively on success (AIMD), so we settle just under the
+    rate the upstream is willing to serve.
+    """
+
+    def __init__(self, rate=10.0, burst=10, min_rate=0.5, max_rate=None, increase=0.1):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate
+        self.increase = increase
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token and return how long the caller has to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self):
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self):
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive upstream failures and fails fast for
+    reset_timeout seconds, then lets a single trial call through (half-open).
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError("Upstream circuit is open, failing fast")
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError("Upstream circuit is half-open, trial call in flight")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """End a call that gave no verdict on the upstream (cancelled or throttled) without changing state."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class ResiliencePolicy:
+    """
+    Wraps calls to one upstream with a token bucket, retries with exponential
+    backoff and full jitter, optional hedging and a circuit breaker.
+
+    is_retryable(exc) decides which errors are worth retrying; is_throttle(exc) marks the
+    ones that are backpressure. Throttles slow the bucket down instead of counting against
+    the breaker, other retryable errors count as upstream failures.
+    """
+
+    def __init__(self, name, is_retryable, is_throttle, max_attempts=4, base_delay=0.5,
+                 max_delay=8.0, hedge_after=None, bucket=None, breaker=None):
+        self.name = name
+        self.is_retryable = is_retryable
+        self.is_throttle = is_throttle
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.bucket = bucket or AdaptiveTokenBucket()
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = {"calls": 0, "retries": 0, "throttles": 0, "hedges": 0, "hedge_wins": 0, "failures": 0, "rejected": 0}
+        policies[name] = self
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _on_error(self, exc, attempt):
+        """Record a failed attempt; returns True when it should be retried."""
+        if not self.is_retryable(exc):
+            # The upstream answered, it just rejected this request
+            self.breaker.record_success()
+            return False
+        if self.is_throttle(exc):
+            # The upstream is alive and asking us to slow down; that is the bucket's job
+            self.stats["throttles"] += 1
+            self.bucket.on_throttle()
+            self.breaker.release_trial()
+        else:
+            self.breaker.record_failure()
+        if attempt + 1 >= self.max_attempts:
+            return False
+        self.stats["retries"] += 1
+        return True
+
+    def _on_success(self):
+        self.breaker.record_success()
+        self.bucket.on_success()
+
+    def _before_attempt(self):
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.stats["rejected"] += 1
+            raise
+
+    async def _hedged(self, fn):
+        """Run fn(); if it is slower than hedge_after, race a second copy against it."""
+        first = asyncio.ensure_future(fn())
+        if not self.hedge_after:
+            return await first
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        self.stats["hedges"] += 1
+        second = asyncio.ensure_future(fn())
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, fn):
+        """Call the coroutine function fn with the full policy applied."""
+        self.stats["calls"] += 1
+        for attempt in range(self.max_attempts):
+            self._before_attempt()
+            try:
+                await self.bucket.acquire()
+                result = await self._hedged(fn)
+            except Exception as e:
+                if not self._on_error(e, attempt):
+                    self.stats["failures"] += 1
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            except BaseException:
+                # Cancelled (client disconnect, lost hedge): free a half-open trial slot
+                self.breaker.release_trial()
+                raise
+            self._on_success()
+            return result
+
+    def call_sync(self, fn):
+        """Blocking variant of call() for code running in worker threads (no hedging)."""
+        self.stats["calls"] += 1
+        for attempt in range(self.max_attempts):
+            self._before_attempt()
+            try:
+                self.bucket.acquire_sync()
+                result = fn()
+            except Exception as e:
+                if not self._on_error(e, attempt):
+                    self.stats["failures"] += 1
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            except BaseException:
+                self.breaker.release_trial()
+                raise
+            self._on_success()
+            return result
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "rate_limit_per_second": round(self.bucket.rate, 3),
+        }
@@ -1,13 +1,21 @@
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI
-from transcribe import router as transcribe_router  # Remove 'app.' from import
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from starlette.routing import Match
+from transcribe import router as transcribe_router, transcription_jobs, backend as transcription_backend  # Remove 'app.' from import
 from analyze_transcript import router as analyze_router  # Add analyze router import
+from entries import router as entries_router, open_db_client, close_db_client
+from resilience import policies as resilience_policies
+from thisapp import metrics
+from thisapp.structured_logging import configure_logging
+import time
 import uvicorn
 import boto3
 import os
     
 load_dotenv()
+configure_logging(os.getenv('LOG_LEVEL', 'INFO'))
 
 api_key = os.getenv('OPENAI_API_KEY')
 if not api_key:
@@ -22,18 +30,56 @@ session = boto3.Session(
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await transcription_backend.start()
+    await transcription_jobs.start()
+    await open_db_client()
     yield
+    await close_db_client()
+    await transcription_jobs.stop()
+    await transcription_backend.stop()
 
 app = FastAPI(lifespan=lifespan)
 
-# Include both routers
+# Include the routers
 app.include_router(transcribe_router, prefix="/api")
 app.include_router(analyze_router, prefix="/analyze")  # Add analyze router
+app.include_router(entries_router, prefix="/api")
+
+def route_template(request: Request):
+    """The matched route path (e.g. /api/transcribe), so metrics aren't labelled per URL"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return 'unmatched'
+
+@app.middleware('http')
+async def record_request_metrics(request: Request, call_next):
+    route = route_template(request)
+    started_at = time.perf_counter()
+    status = 500
+    try:
+        with metrics.http_requests_in_flight.track_inprogress():
+            response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.http_request_duration_seconds.observe(time.perf_counter() - started_at, method=request.method, route=route)
+        metrics.http_requests_total.inc(method=request.method, route=route, status=status)
+
+@app.get('/metrics')
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get('/health')
 async def health():
     return {'status': 'healthy'}
 
+@app.get('/resilience')
+async def resilience_stats():
+    """Retry, throttle and circuit breaker state for each upstream"""
+    return {name: policy.snapshot() for name, policy in resilience_policies.items()}
+
 if __name__ == '__main__':
 
     uvicorn.run(app, host='0.0.0.0', port=8000)
\ No newline at end of file
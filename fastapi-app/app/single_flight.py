@@ -0,0 +1,39 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time; callers that arrive while it runs
+    await the same result. The computation runs in its own task, so cancelling one
+    caller never cancels it for the others. It is only cancelled once every caller
+    waiting on it has gone.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> [task, number of callers waiting]
+
+    def __contains__(self, key):
+        return key in self._calls
+
+    async def run(self, key, compute):
+        """Await compute() for key, joining the computation already in flight if there is one."""
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = [asyncio.ensure_future(compute()), 0]
+            call[0].add_done_callback(lambda _: self._forget(key, call))
+        call[1] += 1
+        try:
+            return await asyncio.shield(call[0])
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not call[0].done():
+                # Nobody wants the result any more; later callers start afresh
+                self._forget(key, call)
+                call[0].cancel()
+
+    def _forget(self, key, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark a failure as retrieved when every caller had already gone
+        if call[0].done() and not call[0].cancelled():
+            call[0].exception()
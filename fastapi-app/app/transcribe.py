@@ -1,29 +1,250 @@
+import io
 import os
-from fastapi import APIRouter, HTTPException
-from openai import OpenAI
+import re
+import json
+import hashlib
+import logging
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+import wave
+import asyncio
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
 from dotenv import load_dotenv
+from transcription_cache import TranscriptionCache, hash_audio, hash_audio_path
+from transcription_backends import create_backend
+from thisapp import metrics
+from vad import StreamingSegmenter, is_silent, trim_silence
+import numpy as np
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client with API key
-api_key = os.getenv('OPENAI_API_KEY')
-if not api_key:
-    raise ValueError("OPENAI_API_KEY environment variable is not set")
-
-client = OpenAI(api_key=api_key)
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Remote Whisper API by default, or a local CPU model with TRANSCRIPTION_BACKEND=local
+backend = create_backend()
+
+# Without ffmpeg files are passed through as is, so the transcription API's 25MB limit applies
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+# With ffmpeg we can compress and split, so much larger recordings are accepted
+MAX_INPUT_BYTES = int(os.getenv('TRANSCRIBE_MAX_INPUT_BYTES', str(500 * 1024 * 1024)))
+FFMPEG = shutil.which("ffmpeg")
+
+def max_input_bytes():
+    return MAX_INPUT_BYTES if FFMPEG else MAX_UPLOAD_BYTES
 
 def check_acceptable_file_size(file_path):
-    # Must be < 25 MB
-    return os.path.getsize(file_path) / (1024 * 1024) < 25
+    return os.path.getsize(file_path) < max_input_bytes()
 
 def check_acceptable_file_extension(file_path):
     allowed = {".m4a", ".mp3", ".webm", ".mp4", ".mpga", ".wav", ".mpeg"}
     ext = os.path.splitext(file_path)[1].lower()
     return ext in allowed
 
-def transcribe_audio(file_path):
+# Uploads are buffered in memory up to this size, then spill over to a temporary file
+UPLOAD_SPOOL_BYTES = int(os.getenv('UPLOAD_SPOOL_BYTES', str(2 * 1024 * 1024)))
+
+# Identical recordings (reruns, retries) are answered from here instead of calling the API again
+transcription_cache = TranscriptionCache(
+    db_path=os.getenv('TRANSCRIPTION_CACHE_DB_PATH', os.path.join(os.path.dirname(__file__), 'cache', 'transcriptions.db')),
+    max_bytes=int(os.getenv('TRANSCRIPTION_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+)
+
+def transcription_cache_key(digest):
+    # The backend and model are part of the key so switching models doesn't serve stale text
+    return f"{backend.name}:{backend.model}:{digest}"
+
+def audio_duration_seconds(audio):
+    """
+    Duration of an audio file (a path, or a seekable WAV file object) in seconds,
+    or None if it can't be determined. WAV headers are read directly; other formats
+    go through ffprobe when it is installed.
+    """
+    try:
+        if not isinstance(audio, (str, os.PathLike)):
+            position = audio.tell()
+            try:
+                with wave.open(audio, "rb") as wav:
+                    return wav.getnframes() / wav.getframerate()
+            finally:
+                audio.seek(position)
+        if os.path.splitext(audio)[1].lower() == ".wav":
+            with wave.open(str(audio), "rb") as wav:
+                return wav.getnframes() / wav.getframerate()
+        if shutil.which("ffprobe"):
+            output = subprocess.run(
+                ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", str(audio)],
+                capture_output=True, check=True, timeout=10
+            ).stdout
+            return float(json.loads(output)["format"]["duration"])
+    except Exception:
+        logger.warning("Could not read audio duration", exc_info=True)
+    return None
+
+async def transcribe_file(audio_file, filename, duration=None):
+    """
+    Transcribe an open, seekable audio file object with the configured backend.
+    The filename is only used to tell the backend which format the audio is in.
+    """
+    text = await backend.transcribe(audio_file, filename)
+    if duration:
+        metrics.audio_seconds_transcribed_total.inc(duration)
+    return text
+
+######################################## PREPROCESSING ########################################
+# Speech only needs mono 16 kHz; Opus at low bitrate keeps an hour of audio well under 25MB
+PREPROCESS_BITRATE = os.getenv('TRANSCRIBE_BITRATE', '24k')
+# Recordings longer than this are split at silences and transcribed in parallel
+CHUNK_SECONDS = float(os.getenv('TRANSCRIBE_CHUNK_SECONDS', '600'))
+# Don't cut chunks shorter than this when looking for a silence to split on
+MIN_CHUNK_SECONDS = CHUNK_SECONDS / 2
+TRANSCRIBE_PARALLELISM = int(os.getenv('TRANSCRIBE_PARALLELISM', '4'))
+SILENCE_NOISE_DB = os.getenv('TRANSCRIBE_SILENCE_NOISE_DB', '-35dB')
+SILENCE_MIN_SECONDS = float(os.getenv('TRANSCRIBE_SILENCE_MIN_SECONDS', '0.4'))
+
+# Drop silence and dead air with voice activity detection before sending audio upstream
+VAD_ENABLED = os.getenv('TRANSCRIBE_VAD', 'true').lower() == 'true'
+SAMPLE_RATE = 16000
+
+def run_ffmpeg(*args, input=None):
+    """Run ffmpeg and return (stdout bytes, stderr text)."""
+    result = subprocess.run(
+        [FFMPEG, "-hide_banner", *map(str, args)],
+        input=input, stdin=None if input is not None else subprocess.DEVNULL, capture_output=True
+    )
+    stderr = result.stderr.decode(errors="replace")
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {stderr.strip()[-500:]}")
+    return result.stdout, stderr
+
+def decode_pcm(src_path):
+    """Decode any input to 16 kHz mono float32 samples."""
+    stdout, _ = run_ffmpeg("-i", src_path, "-vn", "-ac", "1", "-ar", SAMPLE_RATE, "-f", "f32le", "pipe:1")
+    return np.frombuffer(stdout, dtype=np.float32)
+
+def encode_opus(dst_path, src_path=None, samples=None):
+    """Encode a file, or raw 16 kHz mono float32 samples, as mono 16 kHz Opus in WebM."""
+    source = ["-i", src_path, "-vn"] if samples is None else ["-f", "f32le", "-ar", SAMPLE_RATE, "-ac", "1", "-i", "pipe:0"]
+    run_ffmpeg(
+        "-y", *source,
+        "-ac", "1", "-ar", SAMPLE_RATE,
+        "-c:a", "libopus", "-b:a", PREPROCESS_BITRATE, "-application", "voip",
+        dst_path,
+        input=None if samples is None else samples.tobytes()
+    )
+
+def preprocess_audio(src_path, dst_dir):
+    """
+    Downmix to mono, resample to 16 kHz, trim non-speech with VAD and encode as Opus in WebM.
+    Returns (path, TimestampMap back to the original audio); path is None when there is no speech.
+    The map is None when VAD is disabled.
+    """
+    dst_path = os.path.join(dst_dir, "preprocessed.webm")
+    if not VAD_ENABLED:
+        encode_opus(dst_path, src_path=src_path)
+        return dst_path, None
+
+    samples = decode_pcm(src_path)
+    trimmed, timestamp_map = trim_silence(samples, SAMPLE_RATE)
+    original_seconds = len(samples) / SAMPLE_RATE
+    metrics.vad_input_audio_seconds_total.inc(original_seconds)
+    metrics.vad_removed_audio_seconds_total.inc(original_seconds - timestamp_map.trimmed_seconds)
+    if original_seconds:
+        metrics.vad_kept_ratio.observe(timestamp_map.trimmed_seconds / original_seconds)
+    logger.debug("VAD trimmed audio", extra={
+        "kept_seconds": round(timestamp_map.trimmed_seconds, 2),
+        "original_seconds": round(original_seconds, 2),
+        "regions": len(timestamp_map.regions),
+    })
+    if len(trimmed) == 0:
+        return None, timestamp_map
+    encode_opus(dst_path, samples=trimmed)
+    return dst_path, timestamp_map
+
+def detect_silences(path):
+    """(start, end) seconds of every silence ffmpeg's silencedetect finds."""
+    _, log = run_ffmpeg(
+        "-i", path, "-af", f"silencedetect=noise={SILENCE_NOISE_DB}:d={SILENCE_MIN_SECONDS}", "-f", "null", "-"
+    )
+    starts = [float(value) for value in re.findall(r"silence_start: (-?[\d.]+)", log)]
+    ends = [float(value) for value in re.findall(r"silence_end: ([\d.]+)", log)]
+    return list(zip(starts, ends))
+
+def plan_chunks(duration, silences, chunk_seconds=CHUNK_SECONDS, min_chunk_seconds=MIN_CHUNK_SECONDS):
+    """
+    Split [0, duration] into chunks of at most chunk_seconds, cutting in the middle of
+    the silence closest to each chunk's limit. Falls back to a hard cut when there is none.
+    """
+    cut_points = [(start + end) / 2 for start, end in silences]
+    chunks, start = [], 0.0
+    while duration - start > chunk_seconds:
+        limit = start + chunk_seconds
+        candidates = [point for point in cut_points if start + min_chunk_seconds <= point <= limit]
+        end = max(candidates) if candidates else limit
+        chunks.append((start, end))
+        start = end
+    chunks.append((start, duration))
+    return chunks
+
+def split_audio(path, chunks, dst_dir):
+    paths = []
+    for i, (start, end) in enumerate(chunks):
+        chunk_path = os.path.join(dst_dir, f"chunk_{i:03d}.webm")
+        run_ffmpeg("-y", "-ss", f"{start:.3f}", "-to", f"{end:.3f}", "-i", path, "-c", "copy", chunk_path)
+        paths.append(chunk_path)
+    return paths
+
+async def transcribe_path(path):
+    duration = await asyncio.to_thread(audio_duration_seconds, path)
+    with open(path, "rb") as audio_file:
+        return await transcribe_file(audio_file, os.path.basename(path), duration)
+
+async def transcribe_recording(file_path):
+    """
+    Preprocess a recording with ffmpeg, split it at silences if it is still too large
+    or long, transcribe the chunks in parallel and stitch the text back in order.
+    Without ffmpeg the file is sent as is.
+    """
+    if not FFMPEG:
+        return await transcribe_path(file_path)
+
+    # ffmpeg runs in worker threads so the event loop stays free
+    with tempfile.TemporaryDirectory(prefix="transcribe_") as work_dir:
+        processed, timestamp_map = await asyncio.to_thread(preprocess_audio, file_path, work_dir)
+        if processed is None:
+            # Nothing but silence, no need to call the backend
+            return ""
+        duration = await asyncio.to_thread(audio_duration_seconds, processed)
+        upload_limit = backend.max_upload_bytes
+        too_large = upload_limit is not None and os.path.getsize(processed) >= upload_limit
+        if duration is None or (duration <= CHUNK_SECONDS and not too_large):
+            return await transcribe_path(processed)
+
+        chunk_seconds = CHUNK_SECONDS
+        if too_large:
+            # Size the chunks so each one lands comfortably under the API limit
+            chunk_seconds = min(chunk_seconds, duration * 0.8 * upload_limit / os.path.getsize(processed))
+        silences = await asyncio.to_thread(detect_silences, processed)
+        if timestamp_map is not None:
+            # Places where VAD cut out a pause are silences in the trimmed audio too
+            silences += [(join, join) for join in timestamp_map.joins()]
+        chunks = plan_chunks(duration, silences, chunk_seconds, chunk_seconds / 2)
+        paths = await asyncio.to_thread(split_audio, processed, chunks, work_dir)
+
+        semaphore = asyncio.Semaphore(TRANSCRIBE_PARALLELISM)
+
+        async def transcribe_chunk(path):
+            async with semaphore:
+                return await transcribe_path(path)
+
+        texts = await asyncio.gather(*(transcribe_chunk(path) for path in paths))
+        return " ".join(text.strip() for text in texts if text.strip())
+
+async def transcribe_audio(file_path):
     if not os.path.exists(file_path):
         raise HTTPException(
             status_code=404, 
@@ -32,20 +253,347 @@ def transcribe_audio(file_path):
     if not check_acceptable_file_size(file_path):
         raise HTTPException(
             status_code=400, 
-            detail="File size is too large. Must be under 25MB."
+            detail=f"File size is too large. Must be under {max_input_bytes() // (1024 * 1024)}MB."
         )
     if not check_acceptable_file_extension(file_path):
         raise HTTPException(
             status_code=400, 
             detail="Unsupported file type."
         )
+
+    digest = await asyncio.to_thread(hash_audio_path, file_path)
+    return await transcription_cache.get_or_compute(
+        transcription_cache_key(digest), lambda: transcribe_recording(file_path)
+    )
+
+def copy_to_path(audio_file, path):
+    with open(path, "wb") as f:
+        shutil.copyfileobj(audio_file, f)
+
+def copy_upload(audio_file):
+    """Copy a spooled upload into a spooled file of its own, rewound for reading."""
+    copy = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    audio_file.seek(0)
+    shutil.copyfileobj(audio_file, copy)
+    audio_file.seek(0)
+    copy.seek(0)
+    return copy
+
+async def transcribe_upload_file(audio_file, filename, digest=None):
+    """
+    Transcribe a spooled upload, answering from the transcription cache when the same
+    audio was transcribed before. digest is the SHA-256 of the audio if already known.
+
+    Requests for the same audio join one transcription, which keeps running for them if the
+    request that started it goes away. It therefore reads a copy of the upload, so the caller
+    can close audio_file as soon as this returns or is cancelled.
+    """
+    if digest is None:
+        digest = await asyncio.to_thread(hash_audio, audio_file)
+    private_file = await asyncio.to_thread(copy_upload, audio_file)
+
+    async def transcribe():
+        with private_file:
+            return await transcribe_spooled_file(private_file, filename)
+    return await transcription_cache.get_or_compute(transcription_cache_key(digest), transcribe)
+
+async def transcribe_spooled_file(audio_file, filename):
+    """Transcribe a spooled upload, going through ffmpeg preprocessing when it is available."""
+    if not FFMPEG:
+        duration = audio_duration_seconds(audio_file) if filename.lower().endswith(".wav") else None
+        return await transcribe_file(audio_file, filename, duration)
+    # ffmpeg needs a real path to read from
+    with tempfile.TemporaryDirectory(prefix="upload_") as upload_dir:
+        path = os.path.join(upload_dir, "input" + os.path.splitext(filename)[1].lower())
+        await asyncio.to_thread(copy_to_path, audio_file, path)
+        return await transcribe_recording(path)
+
+async def spool_request_body(request: Request):
+    """
+    Read the request body as a stream into a SpooledTemporaryFile so memory stays
+    bounded, hashing it on the way in. Returns (file, sha256 hex digest).
+    Rejects bodies over the size limit as soon as they cross it.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > max_input_bytes():
+                raise HTTPException(status_code=413, detail=f"File size is too large. Must be under {max_input_bytes() // (1024 * 1024)}MB.")
+            spooled.write(chunk)
+            digest.update(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    if size == 0:
+        spooled.close()
+        raise HTTPException(status_code=400, detail="Empty request body.")
+    spooled.seek(0)
+    return spooled, digest.hexdigest()
+
+@router.post("/transcribe/upload")
+async def transcribe_upload(request: Request, filename: str = "audio.wav"):
+    """
+    Transcribe audio sent as the raw request body.
     
-    with open(file_path, "rb") as audio_file:
-        transcription = client.audio.transcriptions.create(
-            model="openai.whisper",
-            file=audio_file
+    Parameters:
+        filename: str - Original file name; its extension tells the API the audio format
+    """
+    if not check_acceptable_file_extension(filename):
+        raise HTTPException(status_code=400, detail="Unsupported file type.")
+
+    audio_file, digest = await spool_request_body(request)
+    try:
+        transcription = await transcribe_upload_file(audio_file, filename, digest)
+        return {"transcription": transcription}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        audio_file.close()
+
+######################################## BACKGROUND JOBS ########################################
+
+class TranscriptionJobs:
+    """
+    Runs transcriptions in the background on a fixed number of worker tasks.
+    Jobs wait in a bounded queue; finished jobs are kept for ttl_seconds so
+    clients can poll for the result.
+    """
+
+    def __init__(self, workers=4, max_queued=100, ttl_seconds=3600):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl_seconds = ttl_seconds
+        self.jobs = {}
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, audio_file, filename, digest=None):
+        self._expire()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "filename": filename,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "transcription": None,
+            "error": None,
+        }
+        try:
+            self._queue.put_nowait((job, audio_file, digest))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail="Too many transcription jobs queued, try again later.")
+        self.jobs[job["job_id"]] = job
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [job_id for job_id, job in self.jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+            del self.jobs[job_id]
+
+    async def _work(self):
+        while True:
+            job, audio_file, digest = await self._queue.get()
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            try:
+                job["transcription"] = await transcribe_upload_file(audio_file, job["filename"], digest)
+                job["status"] = "succeeded"
+            except HTTPException as e:
+                job["status"], job["error"] = "failed", e.detail
+            except Exception as e:
+                job["status"], job["error"] = "failed", str(e)
+            finally:
+                job["finished_at"] = time.time()
+                audio_file.close()
+                self._queue.task_done()
+
+    def snapshot(self):
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "jobs": len(self.jobs),
+        }
+
+
+transcription_jobs = TranscriptionJobs(
+    workers=int(os.getenv('TRANSCRIBE_JOB_WORKERS', '4')),
+    max_queued=int(os.getenv('TRANSCRIBE_JOB_MAX_QUEUED', '100')),
+    ttl_seconds=float(os.getenv('TRANSCRIBE_JOB_TTL_SECONDS', '3600'))
+)
+
+@router.post("/transcribe/jobs", status_code=202)
+async def create_transcription_job(request: Request, filename: str = "audio.wav"):
+    """
+    Queue audio sent as the raw request body for transcription.
+    Returns a job id to poll with GET /transcribe/jobs/{job_id}.
+    """
+    if not check_acceptable_file_extension(filename):
+        raise HTTPException(status_code=400, detail="Unsupported file type.")
+    audio_file, digest = await spool_request_body(request)
+    try:
+        job = transcription_jobs.submit(audio_file, filename, digest)
+    except HTTPException:
+        audio_file.close()
+        raise
+    return {"job_id": job["job_id"], "status": job["status"]}
+
+@router.get("/transcribe/jobs/{job_id}")
+async def get_transcription_job(job_id: str):
+    job = transcription_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+######################################## STREAMING ########################################
+# Segments are cut at pauses once they are this long, and forced at the maximum
+STREAM_MIN_SEGMENT_SECONDS = float(os.getenv('TRANSCRIBE_STREAM_MIN_SEGMENT_SECONDS', '5'))
+STREAM_MAX_SEGMENT_SECONDS = float(os.getenv('TRANSCRIBE_STREAM_MAX_SEGMENT_SECONDS', '30'))
+
+def pcm_to_wav(samples):
+    """Encode float32 samples as an in-memory 16-bit WAV file."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+    buffer.seek(0)
+    return buffer
+
+class StreamingTranscription:
+    """
+    One live recording: audio is segmented at pauses as it arrives and every segment
+    is transcribed in the background, so at stop only the tail is left to do.
+    """
+
+    def __init__(self, websocket, sample_rate=SAMPLE_RATE):
+        self.websocket = websocket
+        self.sample_rate = sample_rate
+        self.segmenter = StreamingSegmenter(
+            SAMPLE_RATE, min_segment_seconds=STREAM_MIN_SEGMENT_SECONDS, max_segment_seconds=STREAM_MAX_SEGMENT_SECONDS
         )
-    return transcription.text
+        self.texts = []  # transcript of every segment, in order; None while pending
+        self.tasks = []
+        self.semaphore = asyncio.Semaphore(TRANSCRIBE_PARALLELISM)
+        self.send_lock = asyncio.Lock()
+
+    async def send(self, message):
+        async with self.send_lock:
+            await self.websocket.send_json(message)
+
+    def transcript(self):
+        """Running transcript: every segment up to the first one still in progress."""
+        done = []
+        for text in self.texts:
+            if text is None:
+                break
+            if text:
+                done.append(text)
+        return " ".join(done)
+
+    def decode(self, data):
+        """16-bit little-endian mono PCM at self.sample_rate to 16 kHz float32."""
+        samples = np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+        if self.sample_rate != SAMPLE_RATE:
+            positions = np.arange(0, len(samples), self.sample_rate / SAMPLE_RATE)
+            samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+        return samples
+
+    def push(self, data):
+        for start, samples in self.segmenter.push(self.decode(data)):
+            self.submit(start, samples)
+
+    def submit(self, start, samples):
+        index = len(self.texts)
+        self.texts.append(None)
+        self.tasks.append(asyncio.create_task(self.transcribe_segment(index, start, samples)))
+
+    async def transcribe_segment(self, index, start, samples):
+        duration = len(samples) / SAMPLE_RATE
+        text = ""
+        # The segmenter already cut at pauses against the stream's noise floor; re-gating a segment
+        # on its own levels would drop loud segments, so only truly silent ones are skipped
+        if not is_silent(samples, SAMPLE_RATE):
+            async with self.semaphore:
+                try:
+                    text = (await transcribe_file(pcm_to_wav(samples), f"segment_{index:04d}.wav", duration)).strip()
+                except HTTPException as e:
+                    await self.send({"type": "error", "index": index, "detail": e.detail})
+                except Exception as e:
+                    await self.send({"type": "error", "index": index, "detail": str(e)})
+        self.texts[index] = text
+        await self.send({
+            "type": "segment", "index": index, "start": round(start, 2), "end": round(start + duration, 2),
+            "text": text, "transcript": self.transcript()
+        })
+
+    async def finish(self):
+        tail = self.segmenter.flush()
+        if tail is not None:
+            self.submit(*tail)
+        await asyncio.gather(*self.tasks)
+        await self.send({"type": "final", "transcript": self.transcript(), "segments": len(self.texts)})
+
+    async def cancel(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+@router.websocket("/transcribe/stream")
+async def transcribe_stream(websocket: WebSocket, sample_rate: int = SAMPLE_RATE):
+    """
+    Incremental transcription while recording.
+
+    The client sends binary messages of 16-bit little-endian mono PCM at sample_rate,
+    then the text message {"type": "stop"}. The server replies with a "segment" message,
+    including the running transcript, each time a segment is transcribed, and a
+    "final" message with the full transcript after stop.
+    """
+    await websocket.accept()
+    session = StreamingTranscription(websocket, sample_rate)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                session.push(message["bytes"])
+            elif message.get("text") is not None and json.loads(message["text"]).get("type") == "stop":
+                break
+        await session.finish()
+        await websocket.close()
+    except WebSocketDisconnect:
+        await session.cancel()
+    except Exception as e:
+        await session.cancel()
+        await websocket.close(code=1011, reason=str(e)[:120])
+
+@router.get("/transcribe/backend")
+async def get_transcription_backend():
+    return backend.snapshot()
+
+@router.get("/transcribe/cache/stats")
+async def get_transcription_cache_stats():
+    return transcription_cache.snapshot()
 
 @router.get("/transcribe")
 async def transcribe_local_file(filepath: str):
@@ -61,8 +609,10 @@ async def transcribe_local_file(filepath: str):
     try:
         # Clean up the filepath by removing any quotes
         clean_filepath = filepath.strip("'")
-        transcription = transcribe_audio(current_dir / clean_filepath)
+        transcription = await transcribe_audio(current_dir / clean_filepath)
         return {"transcription": transcription}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -80,7 +630,7 @@ if __name__ == "__main__":
         assert check_acceptable_file_extension(test_file_path), "Bad extension!"
 
         # Transcribe
-        text = transcribe_audio(test_file_path)
+        text = asyncio.run(transcribe_audio(test_file_path))
         print("Transcription:", text)
 
     except Exception as e:
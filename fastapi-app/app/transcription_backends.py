@@ -0,0 +1,307 @@
+"""
+Speech-to-text backends used by transcribe.py.
+
+remote: the hosted Whisper model behind the OpenAI-compatible API (the default).
+local:  Whisper running on this machine's CPU through transformers, with dynamic int8
+        quantization and concurrent requests batched into a single forward pass.
+
+Select one with TRANSCRIPTION_BACKEND=remote|local.
+"""
+import asyncio
+import os
+import shutil
+import subprocess
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from resilience import AdaptiveTokenBucket, CircuitBreaker, CircuitOpenError, ResiliencePolicy
+from thisapp import metrics
+
+FFMPEG = shutil.which("ffmpeg")
+SAMPLE_RATE = 16000
+
+
+class TranscriptionBackend:
+    """
+    Interface every backend implements. transcribe() takes an open, seekable audio
+    file object; filename only tells the backend which format the audio is in.
+    """
+    name = ""
+    model = ""
+    # Largest file a single transcribe() call accepts, None when there is no limit
+    max_upload_bytes = None
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def transcribe(self, audio_file, filename):
+        raise NotImplementedError
+
+    def snapshot(self):
+        return {"backend": self.name, "model": self.model}
+
+
+class RemoteWhisperBackend(TranscriptionBackend):
+    name = "remote"
+    # The transcription API takes at most 25MB per request
+    max_upload_bytes = 25 * 1024 * 1024
+
+    def __init__(self, api_key, model="openai.whisper", max_attempts=4, rate_limit_per_second=2.0):
+        from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is not set")
+        self.model = model
+        self.rate_limit_error = RateLimitError
+        # Async client so transcriptions never block the event loop; retries are handled by the policy
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0)
+        self.policy = ResiliencePolicy(
+            'whisper',
+            is_retryable=lambda err: isinstance(err, (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)),
+            is_throttle=lambda err: isinstance(err, RateLimitError),
+            max_attempts=max_attempts,
+            bucket=AdaptiveTokenBucket(rate=rate_limit_per_second, burst=4),
+            breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+        )
+
+    async def transcribe(self, audio_file, filename):
+        async def create_transcription():
+            # Rewind on every attempt so a retry uploads the whole file again
+            audio_file.seek(0)
+            started_at = time.perf_counter()
+            try:
+                with metrics.upstream_requests_in_flight.track_inprogress(upstream='whisper'):
+                    return await self.client.audio.transcriptions.create(
+                        model=self.model,
+                        file=(filename, audio_file)
+                    )
+            except Exception:
+                metrics.upstream_errors_total.inc(upstream='whisper', operation='transcribe')
+                raise
+            finally:
+                metrics.upstream_request_duration_seconds.observe(
+                    time.perf_counter() - started_at, upstream='whisper', operation='transcribe'
+                )
+
+        try:
+            transcription = await self.policy.call(create_transcription)
+        except CircuitOpenError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except self.rate_limit_error as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        return transcription.text
+
+    def snapshot(self):
+        return {**super().snapshot(), "policy": self.policy.snapshot()}
+
+
+def decode_audio(audio_file, filename):
+    """
+    Decode audio to 16 kHz mono float32 samples, the input Whisper expects.
+    Uses ffmpeg when it is installed; without it only WAV can be read.
+    """
+    import numpy as np
+
+    audio_file.seek(0)
+    if FFMPEG:
+        result = subprocess.run(
+            [FFMPEG, "-nostdin", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+             "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"],
+            input=audio_file.read(), capture_output=True
+        )
+        if result.returncode != 0:
+            raise HTTPException(status_code=400, detail=f"Could not decode audio: {result.stderr.decode(errors='replace').strip()[-300:]}")
+        return np.frombuffer(result.stdout, dtype=np.float32)
+
+    if not filename.lower().endswith(".wav"):
+        raise HTTPException(status_code=400, detail="Local transcription without ffmpeg only supports WAV audio.")
+    with wave.open(audio_file, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise HTTPException(status_code=400, detail="Local transcription without ffmpeg only supports 16-bit WAV audio.")
+        channels, rate = wav.getnchannels(), wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16).astype(np.float32) / 32768.0
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        # Linear interpolation is good enough for speech
+        positions = np.arange(0, len(samples), rate / SAMPLE_RATE)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    Whisper on CPU via a transformers pipeline. The model is loaded once, quantized to
+    int8 for its Linear layers when the platform supports it, and requests that arrive
+    within max_wait_ms of each other are run as one batch on a single inference thread.
+    """
+    name = "local"
+
+    def __init__(self, model="openai/whisper-base", batch_size=8, max_wait_ms=50, threads=None, quantize=True):
+        self.model = model
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.threads = threads or os.cpu_count()
+        self.quantize = quantize
+        self.quantized = False
+        self._pipeline = None
+        self._queue = None
+        self._batcher = None
+        # One inference thread; torch parallelizes each batch over self.threads cores
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-whisper")
+        self.stats = {"requests": 0, "batches": 0, "largest_batch": 0, "audio_seconds": 0.0, "inference_seconds": 0.0}
+
+    def _load(self):
+        if self._pipeline is not None:
+            return self._pipeline
+        import torch
+        from transformers import pipeline
+
+        torch.set_num_threads(self.threads)
+        asr = pipeline("automatic-speech-recognition", model=self.model, device=-1, chunk_length_s=30)
+        if self.quantize and any(engine != "none" for engine in torch.backends.quantized.supported_engines):
+            asr.model = torch.ao.quantization.quantize_dynamic(asr.model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.quantized = True
+        asr.model.eval()
+        self._pipeline = asr
+        return asr
+
+    def _infer(self, batch):
+        import torch
+
+        asr = self._load()
+        with torch.inference_mode():
+            outputs = asr(
+                [{"raw": samples, "sampling_rate": SAMPLE_RATE} for samples in batch],
+                batch_size=len(batch),
+                generate_kwargs={"task": "transcribe"}
+            )
+        return [output["text"].strip() for output in outputs]
+
+    async def start(self):
+        # Load the model up front so the first request doesn't pay for it
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._load)
+
+    async def stop(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+            self._batcher = None
+
+    async def transcribe(self, audio_file, filename):
+        samples = await asyncio.to_thread(decode_audio, audio_file, filename)
+        if self._batcher is None or self._batcher.done():
+            self._queue = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._run_batches())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((samples, future))
+        return await future
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Drop requests whose caller went away while they were queued
+        return [(samples, future) for samples, future in batch if not future.cancelled()]
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+            started_at = time.perf_counter()
+            try:
+                with metrics.upstream_requests_in_flight.track_inprogress(upstream='local_whisper'):
+                    texts = await loop.run_in_executor(self._executor, self._infer, [samples for samples, _ in batch])
+            except Exception as e:
+                metrics.upstream_errors_total.inc(upstream='local_whisper', operation='transcribe')
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                elapsed = time.perf_counter() - started_at
+                metrics.upstream_request_duration_seconds.observe(elapsed, upstream='local_whisper', operation='transcribe')
+
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            self.stats["audio_seconds"] += sum(len(samples) for samples, _ in batch) / SAMPLE_RATE
+            self.stats["inference_seconds"] += elapsed
+            for (_, future), text in zip(batch, texts):
+                if not future.done():
+                    future.set_result(text)
+
+    def snapshot(self):
+        inference_seconds = self.stats["inference_seconds"]
+        return {
+            **super().snapshot(),
+            **self.stats,
+            "threads": self.threads,
+            "quantized": self.quantized,
+            # Seconds of audio transcribed per second of compute per core
+            "realtime_factor_per_core": (
+                round(self.stats["audio_seconds"] / inference_seconds / self.threads, 3) if inference_seconds else None
+            ),
+        }
+
+
+def create_backend(name=None):
+    """Build the backend named by TRANSCRIPTION_BACKEND (remote or local)."""
+    name = name or os.getenv('TRANSCRIPTION_BACKEND', 'remote')
+    if name == "remote":
+        return RemoteWhisperBackend(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            model=os.getenv('WHISPER_MODEL', 'openai.whisper'),
+            max_attempts=int(os.getenv('WHISPER_MAX_ATTEMPTS', '4')),
+            rate_limit_per_second=float(os.getenv('WHISPER_RATE_LIMIT_PER_SECOND', '2'))
+        )
+    if name == "local":
+        threads = os.getenv('LOCAL_WHISPER_THREADS')
+        return LocalWhisperBackend(
+            model=os.getenv('LOCAL_WHISPER_MODEL', 'openai/whisper-base'),
+            batch_size=int(os.getenv('LOCAL_WHISPER_BATCH_SIZE', '8')),
+            max_wait_ms=float(os.getenv('LOCAL_WHISPER_MAX_WAIT_MS', '50')),
+            threads=int(threads) if threads else None,
+            quantize=os.getenv('LOCAL_WHISPER_QUANTIZE', 'true').lower() == 'true'
+        )
+    raise ValueError(f"Unknown TRANSCRIPTION_BACKEND: {name}")
+
+
+if __name__ == "__main__":
+    # Throughput check: python transcription_backends.py local recordings/a.wav recordings/b.wav
+    import sys
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    async def main(backend_name, paths):
+        backend = create_backend(backend_name)
+        await backend.start()
+        files = [open(path, "rb") for path in paths]
+        try:
+            started_at = time.perf_counter()
+            texts = await asyncio.gather(*(backend.transcribe(f, os.path.basename(path)) for f, path in zip(files, paths)))
+            elapsed = time.perf_counter() - started_at
+        finally:
+            for f in files:
+                f.close()
+            await backend.stop()
+        for path, text in zip(paths, texts):
+            print(f"{path}: {text[:80]}")
+        print(f"{len(paths)} files in {elapsed:.2f}s")
+        print(backend.snapshot())
+
+    asyncio.run(main(sys.argv[1], sys.argv[2:]))
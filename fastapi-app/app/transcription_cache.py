@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from single_flight import SingleFlight
+
+HASH_CHUNK_BYTES = 1024 * 1024
+# Access times of cache hits are kept in memory and written in batches of this size
+TOUCH_BATCH_SIZE = 100
+
+
+def hash_audio(audio_file):
+    """
+    SHA-256 of a seekable audio file object, read in chunks so large
+    recordings are never loaded into memory at once. Rewinds the file afterwards.
+    """
+    digest = hashlib.sha256()
+    audio_file.seek(0)
+    for chunk in iter(lambda: audio_file.read(HASH_CHUNK_BYTES), b""):
+        digest.update(chunk)
+    audio_file.seek(0)
+    return digest.hexdigest()
+
+
+def hash_audio_path(path):
+    with open(path, "rb") as audio_file:
+        return hash_audio(audio_file)
+
+
+class TranscriptionCache:
+    """
+    Persistent cache of transcriptions keyed by the audio's content hash, stored in SQLite.
+    When the stored text grows past max_bytes the least recently used entries are evicted.
+    Concurrent requests for the same audio share a single in-flight transcription.
+
+    A hit only reads: its access time is buffered and written with the next insert or
+    once TOUCH_BATCH_SIZE hits have accumulated. Database work in get_or_compute runs
+    in a thread so it never blocks the event loop.
+    """
+
+    def __init__(self, db_path, max_bytes=50 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._in_flight = SingleFlight()
+        self._touched = {}  # key -> last used time not yet written
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS transcriptions "
+            "(key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_transcriptions_last_used_at ON transcriptions (last_used_at)")
+        self._db.commit()
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM transcriptions").fetchone()[0]
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT text FROM transcriptions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH_SIZE:
+                self._flush_touched()
+                self._db.commit()
+        return row[0]
+
+    def _flush_touched(self):
+        """Write buffered access times. Caller holds the lock and commits."""
+        if self._touched:
+            self._db.executemany(
+                "UPDATE transcriptions SET last_used_at = ? WHERE key = ?",
+                [(used_at, key) for key, used_at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def set(self, key, text):
+        size = len(text.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM transcriptions WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcriptions (key, text, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, text, size, now, now),
+            )
+            self._size += size - (old[0] if old else 0)
+            self._touched.pop(key, None)
+            # Eviction must see current access times
+            self._flush_touched()
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes. Caller holds the lock."""
+        while self._size > self.max_bytes:
+            row = self._db.execute(
+                "SELECT key, size FROM transcriptions ORDER BY last_used_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM transcriptions WHERE key = ?", (row[0],))
+            self._size -= row[1]
+            self.stats["evictions"] += 1
+
+    async def get_or_compute(self, key, compute):
+        """
+        Return the cached transcription for key, or await compute() once and cache its result.
+        Callers that arrive while compute() is running share its result.
+        """
+        text = await asyncio.to_thread(self.get, key)
+        if text is not None:
+            self.stats["hits"] += 1
+            return text
+
+        self.stats["coalesced" if key in self._in_flight else "misses"] += 1
+
+        async def compute_and_store():
+            text = await compute()
+            await asyncio.to_thread(self.set, key, text)
+            return text
+        return await self._in_flight.run(key, compute_and_store)
+
+    def snapshot(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM transcriptions").fetchone()[0]
+        return {
+            **self.stats,
+            "entries": entries,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,189 @@
+"""
+Energy based voice activity detection over 16 kHz mono float32 PCM.
+
+Frames are scored by their RMS level relative to the recording's own noise floor and
+the peak speech level, so the same thresholds work for quiet and loud microphones.
+Speech regions are padded and short gaps merged so words are never clipped.
+
+Detection fails open: only audio below an absolute floor is ever treated as all
+silence, and a recording without clearly quieter stretches is kept whole.
+"""
+from bisect import bisect_right
+from collections import deque
+import numpy as np
+
+FRAME_MS = 30
+# Frames quieter than this are silence on any microphone
+SILENCE_DBFS = -60.0
+# Recordings spanning fewer dB than this between noise floor and peak have no pauses to
+# tell apart from speech (continuous speech, or noise throughout) and are kept whole
+MIN_DYNAMIC_RANGE_DB = 25.0
+# A frame is speech when it is this many dB above the noise floor...
+THRESHOLD_DB = 12.0
+# ...and no more than this many dB below the loudest frames
+MAX_BELOW_PEAK_DB = 45.0
+# Padding kept around every speech region
+PAD_SECONDS = 0.25
+# Pauses shorter than this stay in, so speech isn't chopped between words
+MIN_SILENCE_SECONDS = 0.6
+# Blips shorter than this (clicks, bumps) are not treated as speech
+MIN_SPEECH_SECONDS = 0.15
+# While streaming, a pause must also be this many dB below typical speech level
+STREAM_PAUSE_BELOW_SPEECH_DB = 20.0
+
+
+def frame_levels_db(samples, sample_rate, frame_ms=FRAME_MS):
+    """RMS level of every frame in dBFS."""
+    frame_length = int(sample_rate * frame_ms / 1000)
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def is_silent(samples, sample_rate, frame_ms=FRAME_MS):
+    """True when nothing in samples is louder than the absolute SILENCE_DBFS floor."""
+    levels = frame_levels_db(samples, sample_rate, frame_ms)
+    return len(levels) == 0 or np.percentile(levels, 99) < SILENCE_DBFS
+
+
+def _runs(mask):
+    """(start, end) frame indexes of every run of True in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def detect_speech(samples, sample_rate, frame_ms=FRAME_MS, threshold_db=THRESHOLD_DB,
+                  pad_seconds=PAD_SECONDS, min_silence_seconds=MIN_SILENCE_SECONDS,
+                  min_speech_seconds=MIN_SPEECH_SECONDS):
+    """
+    (start, end) seconds of the speech regions in samples. Empty only when nothing
+    is louder than SILENCE_DBFS; the whole recording when no pauses stand out.
+    """
+    levels = frame_levels_db(samples, sample_rate, frame_ms)
+    if len(levels) == 0:
+        return []
+    if is_silent(samples, sample_rate, frame_ms):
+        return []
+    duration = len(samples) / sample_rate
+    noise_floor, peak = np.percentile(levels, [10, 99])
+    if peak - noise_floor < MIN_DYNAMIC_RANGE_DB:
+        return [(0.0, duration)]
+    threshold = max(SILENCE_DBFS, noise_floor + threshold_db, peak - MAX_BELOW_PEAK_DB)
+
+    frame_seconds = frame_ms / 1000
+    regions = []
+    for start, end in _runs(levels >= threshold):
+        if (end - start) * frame_seconds < min_speech_seconds:
+            continue
+        start_s = max(0.0, float(start) * frame_seconds - pad_seconds)
+        end_s = min(duration, float(end) * frame_seconds + pad_seconds)
+        if regions and start_s - regions[-1][1] < min_silence_seconds:
+            regions[-1] = (regions[-1][0], end_s)
+        else:
+            regions.append((start_s, end_s))
+    # Only blips cleared the threshold; keeping everything is safer than dropping speech
+    return regions or [(0.0, duration)]
+
+
+class TimestampMap:
+    """
+    Maps times in trimmed audio (speech regions concatenated) back to the original
+    recording, e.g. to place segment timestamps returned for the trimmed audio.
+    """
+
+    def __init__(self, regions):
+        self.regions = list(regions)
+        self.offsets = []  # start of every region in the trimmed timeline
+        total = 0.0
+        for start, end in self.regions:
+            self.offsets.append(total)
+            total += end - start
+        self.trimmed_seconds = total
+
+    def to_original(self, trimmed_time):
+        if not self.regions:
+            return trimmed_time
+        i = max(0, bisect_right(self.offsets, trimmed_time) - 1)
+        start, end = self.regions[i]
+        return min(end, start + trimmed_time - self.offsets[i])
+
+    def joins(self):
+        """Trimmed-timeline times where two speech regions were joined; natural places to cut."""
+        return self.offsets[1:]
+
+
+def trim_silence(samples, sample_rate, **options):
+    """
+    Drop non-speech regions from samples.
+    Returns (trimmed samples, TimestampMap back to the original timeline).
+    """
+    regions = detect_speech(samples, sample_rate, **options)
+    if not regions:
+        return samples[:0], TimestampMap([])
+    trimmed = np.concatenate([
+        samples[int(start * sample_rate):int(end * sample_rate)] for start, end in regions
+    ])
+    return trimmed, TimestampMap(regions)
+
+
+class StreamingSegmenter:
+    """
+    Cuts a live PCM stream into segments at pauses so each one can be transcribed
+    while recording continues. A segment is cut at the first pause of at least
+    silence_seconds once it is min_segment_seconds long, or at its quietest frame
+    when it reaches max_segment_seconds without one.
+    """
+
+    def __init__(self, sample_rate=16000, min_segment_seconds=5.0, max_segment_seconds=30.0,
+                 silence_seconds=0.5, frame_ms=FRAME_MS, threshold_db=THRESHOLD_DB, history_seconds=120):
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.min_frames = int(min_segment_seconds * 1000 / frame_ms)
+        self.max_frames = int(max_segment_seconds * 1000 / frame_ms)
+        self.silence_frames = max(1, int(silence_seconds * 1000 / frame_ms))
+        self.threshold_db = threshold_db
+        self.buffer = np.empty(0, dtype=np.float32)
+        self.offset = 0.0  # stream time of buffer[0] in seconds
+        # Levels of already segmented frames, so noise floor and speech level cover more than the buffer
+        self.history = deque(maxlen=int(history_seconds * 1000 / frame_ms))
+
+    def _find_cut(self):
+        """Sample index to cut the buffer at, or None to keep waiting for audio."""
+        levels = frame_levels_db(self.buffer, self.sample_rate, self.frame_length * 1000 / self.sample_rate)
+        if len(levels) < self.min_frames:
+            return None
+        known = np.concatenate((np.fromiter(self.history, dtype=np.float64, count=len(self.history)), levels))
+        noise_floor, speech_level = np.percentile(known, [10, 90])
+        # Continuous speech has no frames far below its own level, so it is never "silent"
+        silent = levels < min(noise_floor + self.threshold_db, speech_level - STREAM_PAUSE_BELOW_SPEECH_DB)
+        for start, end in _runs(silent):
+            if end - start >= self.silence_frames and (start + end) // 2 >= self.min_frames:
+                return (start + end) // 2 * self.frame_length
+        if len(levels) >= self.max_frames:
+            quietest = self.min_frames + int(np.argmin(levels[self.min_frames:self.max_frames]))
+            return quietest * self.frame_length
+        return None
+
+    def _take(self, cut):
+        self.history.extend(frame_levels_db(self.buffer[:cut], self.sample_rate, self.frame_length * 1000 / self.sample_rate))
+        segment = (self.offset, self.buffer[:cut])
+        self.buffer = self.buffer[cut:]
+        self.offset += cut / self.sample_rate
+        return segment
+
+    def push(self, samples):
+        """Add samples; returns the (start seconds, samples) segments completed by them."""
+        self.buffer = np.concatenate((self.buffer, samples))
+        segments = []
+        while (cut := self._find_cut()) is not None:
+            segments.append(self._take(cut))
+        return segments
+
+    def flush(self):
+        """The remaining tail as a final segment, or None when nothing is buffered."""
+        if len(self.buffer) == 0:
+            return None
+        return self._take(len(self.buffer))
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The service modules use flat imports (they run from fastapi-app/app), so do the same here
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+# transcribe.py creates its API client and transcription cache at import time
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("TRANSCRIPTION_CACHE_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="transcribe-tests-"), "cache.db"))
@@ -0,0 +1,59 @@
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("fastapi")
+
+from analyze_transcript import estimate_tokens, parse_entry_analysis, split_transcript  # noqa: E402
+
+
+def test_parses_every_field():
+    text = '{"title": "Run", "summary": " You ran. ", "key_points": "- running"}'
+    assert parse_entry_analysis(text) == {"title": "Run", "summary": "You ran.", "key_points": "- running"}
+
+
+def test_ignores_text_around_the_object():
+    text = 'Here you go:\n{"title": "Run", "summary": "You ran.", "key_points": "- running"}\nHope that helps'
+    assert parse_entry_analysis(text)["title"] == "Run"
+
+
+def test_keeps_the_valid_fields_of_a_partial_answer():
+    text = '{"title": "Run", "summary": "", "key_points": ["- running"]}'
+    assert parse_entry_analysis(text) == {"title": "Run"}
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "No JSON here",
+    '{"title": "Run", "summary": "You ran',  # cut off at max_tokens
+    '{"title": "Run",, "summary": "You ran."}',
+    '}{',
+])
+def test_malformed_answers_parse_to_nothing(text):
+    assert parse_entry_analysis(text) == {}
+
+
+def test_only_the_requested_fields_are_returned():
+    text = '{"title": "Run", "summary": "You ran.", "key_points": "- running"}'
+    assert parse_entry_analysis(text, fields=("title",)) == {"title": "Run"}
+
+
+def test_short_text_is_one_chunk():
+    assert split_transcript("I went for a run. It rained.", max_tokens=100) == ["I went for a run. It rained."]
+
+
+def test_chunks_break_on_sentence_boundaries():
+    sentences = [f"Sentence number {i} is here." for i in range(10)]
+    chunks = split_transcript(" ".join(sentences), max_tokens=20)
+
+    assert len(chunks) > 1
+    assert " ".join(chunks) == " ".join(sentences)
+    assert all(chunk.endswith(".") and estimate_tokens(chunk) <= 20 for chunk in chunks)
+
+
+def test_sentence_over_the_budget_is_split_on_whitespace():
+    sentence = " ".join(["word"] * 100) + "."
+    chunks = split_transcript(sentence, max_tokens=10)
+
+    assert len(chunks) > 1
+    assert " ".join(chunks) == sentence
+    assert all(estimate_tokens(chunk) <= 10 for chunk in chunks)
@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+import transcription_cache
+from completion_cache import CompletionCache
+from single_flight import SingleFlight
+from transcription_cache import TranscriptionCache
+
+
+def test_concurrent_callers_share_one_computation():
+    cache = CompletionCache()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"text": "done"}
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_compute("key", compute) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [{"text": "done"}] * 5
+    assert calls == 1
+    assert cache.stats["misses"] == 1 and cache.stats["coalesced"] == 4
+    assert asyncio.run(cache.get_or_compute("key", compute)) == {"text": "done"}
+    assert cache.stats["hits"] == 1
+
+
+def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    cache = CompletionCache()
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "value"
+
+        owner = asyncio.ensure_future(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await waiter
+
+    assert asyncio.run(scenario()) == "value"
+    assert cache.get("key") == "value"
+
+
+def test_computation_is_cancelled_once_nobody_waits():
+    flights = SingleFlight()
+    cancelled = False
+
+    async def scenario():
+        async def compute():
+            nonlocal cancelled
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+
+        caller = asyncio.ensure_future(flights.run("key", compute))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert "key" not in flights
+
+        async def fresh():
+            return "fresh"
+        return await flights.run("key", fresh)
+
+    assert asyncio.run(scenario()) == "fresh"
+    assert cancelled
+
+
+def test_failures_reach_every_caller_and_are_not_cached():
+    cache = CompletionCache()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_compute("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get("key") is None
+
+
+def test_transcription_cache_evicts_least_recently_used(tmp_path):
+    cache = TranscriptionCache(str(tmp_path / "cache.db"), max_bytes=10)
+    cache.set("a", "aaaa")
+    cache.set("b", "bbbb")
+    assert cache.get("a") == "aaaa"  # a is now more recently used than b
+    cache.set("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa" and cache.get("c") == "cccc"
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_transcription_cache_hits_write_access_times_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcription_cache, "TOUCH_BATCH_SIZE", 3)
+    cache = TranscriptionCache(str(tmp_path / "cache.db"))
+    for key in "abc":
+        cache.set(key, key)
+    changes = cache._db.total_changes
+    cache.get("a")
+    cache.get("b")
+    assert cache._db.total_changes == changes
+    cache.get("c")
+    assert cache._db.total_changes == changes + 3
+
+
+def test_transcription_cache_get_or_compute(tmp_path):
+    cache = TranscriptionCache(str(tmp_path / "cache.db"))
+    calls = 0
+
+    async def transcribe():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "hello world"
+
+    async def scenario():
+        first = await asyncio.gather(*(cache.get_or_compute("audio", transcribe) for _ in range(3)))
+        return first, await cache.get_or_compute("audio", transcribe)
+
+    first, again = asyncio.run(scenario())
+    assert first == ["hello world"] * 3 and again == "hello world"
+    assert calls == 1
+
+
+def test_completion_cache_persistent_tier_survives_a_restart(tmp_path):
+    db_path = str(tmp_path / "completions.db")
+
+    async def compute():
+        return {"text": "done"}
+
+    async def fail():
+        raise AssertionError("should have been answered from the SQLite tier")
+
+    assert asyncio.run(CompletionCache(db_path=db_path).get_or_compute("key", compute)) == {"text": "done"}
+    restarted = CompletionCache(db_path=db_path)
+    assert asyncio.run(restarted.get_or_compute("key", fail)) == {"text": "done"}
+    assert restarted.stats["persistent_hits"] == 1 and restarted.stats["hits"] == 1
@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("fastapi")
+
+import analyze_transcript  # noqa: E402
+from analyze_transcript import MODEL_ROUTES, LatencyTracker, select_route  # noqa: E402
+
+SUMMARY = MODEL_ROUTES["summary"]
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    tracker = LatencyTracker(window_seconds=60, min_samples=5)
+    monkeypatch.setattr(analyze_transcript, "latency_tracker", tracker)
+    return tracker
+
+
+def observe(tracker, model_id, latency_ms, count=10):
+    for _ in range(count):
+        tracker.observe(model_id, latency_ms)
+
+
+def test_p95_needs_enough_samples():
+    tracker = LatencyTracker(min_samples=5)
+    observe(tracker, "model", 100, count=4)
+    assert tracker.p95("model") is None
+    tracker.observe("model", 100)
+    assert tracker.p95("model") == 100
+    assert tracker.p95("unknown") is None
+
+
+def test_p95_ignores_samples_older_than_the_window(monkeypatch):
+    tracker = LatencyTracker(window_seconds=60, min_samples=1)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    observe(tracker, "model", 5000)
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert tracker.p95("model") is None
+
+
+def test_primary_model_within_budget(tracker):
+    observe(tracker, SUMMARY.model_id, SUMMARY.latency_budget_ms / 2)
+    assert select_route("summary") == SUMMARY
+
+
+def test_falls_back_when_the_primary_is_over_budget(tracker):
+    observe(tracker, SUMMARY.model_id, SUMMARY.latency_budget_ms * 2)
+    route = select_route("summary")
+    assert route.model_id == SUMMARY.fallback_model_id
+    assert route.max_tokens == SUMMARY.max_tokens
+
+
+def test_budget_no_model_meets_uses_the_faster_one(tracker):
+    observe(tracker, SUMMARY.model_id, SUMMARY.latency_budget_ms * 2)
+    observe(tracker, SUMMARY.fallback_model_id, SUMMARY.latency_budget_ms * 3)
+    assert select_route("summary") == SUMMARY
+
+    observe(tracker, SUMMARY.fallback_model_id, SUMMARY.latency_budget_ms * 1.5, count=200)
+    assert select_route("summary").model_id == SUMMARY.fallback_model_id
+
+
+def test_tasks_without_a_budget_never_fall_back(tracker):
+    observe(tracker, MODEL_ROUTES["title"].model_id, 60_000)
+    assert select_route("title") == MODEL_ROUTES["title"]
+
+
+def test_unknown_task_uses_the_default_route(tracker):
+    assert select_route("no-such-task") == MODEL_ROUTES["default"]
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from resilience import AdaptiveTokenBucket, CircuitBreaker, CircuitOpenError, ResiliencePolicy
+
+
+class Unavailable(Exception):
+    pass
+
+
+class Throttled(Exception):
+    pass
+
+
+def make_policy(name, **kwargs):
+    return ResiliencePolicy(
+        name,
+        is_retryable=lambda err: isinstance(err, (Unavailable, Throttled)),
+        is_throttle=lambda err: isinstance(err, Throttled),
+        base_delay=0,
+        max_delay=0,
+        bucket=AdaptiveTokenBucket(rate=1000, burst=1000),
+        **kwargs,
+    )
+
+
+def half_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_cancelled_half_open_trial_frees_the_slot():
+    policy = make_policy("test-cancel", max_attempts=1, breaker=half_open_breaker())
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(60)
+
+        trial = asyncio.ensure_future(policy.call(hang))
+        await started.wait()
+        assert policy.breaker.state == CircuitBreaker.HALF_OPEN
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        async def ok():
+            return "ok"
+        return await policy.call(ok)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_second_call_is_rejected_while_trial_in_flight():
+    breaker = half_open_breaker()
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.release_trial()
+    breaker.before_call()
+
+
+def test_throttles_slow_the_bucket_without_opening_the_breaker():
+    policy = make_policy("test-throttle", max_attempts=10, breaker=CircuitBreaker(failure_threshold=3))
+    calls = 0
+
+    async def throttled_then_ok():
+        nonlocal calls
+        calls += 1
+        if calls <= 6:
+            raise Throttled()
+        return "ok"
+
+    assert asyncio.run(policy.call(throttled_then_ok)) == "ok"
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+    assert policy.stats["throttles"] == 6
+    assert policy.bucket.rate < 1000
+
+
+def test_failures_open_the_breaker():
+    policy = make_policy("test-failures", max_attempts=3, breaker=CircuitBreaker(failure_threshold=3))
+
+    def unavailable():
+        raise Unavailable()
+
+    with pytest.raises(Unavailable):
+        policy.call_sync(unavailable)
+    assert policy.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        policy.call_sync(unavailable)
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("openai")
+
+from transcribe import plan_chunks  # noqa: E402
+
+
+def assert_covers(chunks, duration, chunk_seconds):
+    assert chunks[0][0] == 0.0 and chunks[-1][1] == duration
+    assert all(previous[1] == following[0] for previous, following in zip(chunks, chunks[1:]))
+    assert all(0 < end - start <= chunk_seconds for start, end in chunks)
+
+
+def test_short_recording_is_one_chunk():
+    assert plan_chunks(300, [(100, 101)], chunk_seconds=600, min_chunk_seconds=300) == [(0.0, 300)]
+
+
+def test_cuts_in_the_silence_closest_to_the_limit():
+    silences = [(200, 202), (500, 504), (900, 910)]
+    chunks = plan_chunks(1500, silences, chunk_seconds=600, min_chunk_seconds=300)
+
+    assert chunks == [(0.0, 502.0), (502.0, 905.0), (905.0, 1500)]
+    assert_covers(chunks, 1500, 600)
+
+
+def test_no_silences_falls_back_to_hard_cuts():
+    chunks = plan_chunks(1500, [], chunk_seconds=600, min_chunk_seconds=300)
+
+    assert chunks == [(0.0, 600.0), (600.0, 1200.0), (1200.0, 1500)]
+
+
+def test_silences_too_early_in_a_chunk_are_not_used():
+    chunks = plan_chunks(1000, [(100, 110)], chunk_seconds=600, min_chunk_seconds=300)
+
+    assert chunks == [(0.0, 600.0), (600.0, 1000)]
+
+
+def test_silence_at_the_end_of_the_recording():
+    chunks = plan_chunks(1000, [(995, 1000)], chunk_seconds=600, min_chunk_seconds=300)
+
+    assert chunks == [(0.0, 600.0), (600.0, 1000)]
+    assert_covers(chunks, 1000, 600)
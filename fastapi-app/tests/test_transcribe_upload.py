@@ -0,0 +1,42 @@
+import asyncio
+import io
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("openai")
+
+import transcribe  # noqa: E402
+from transcription_cache import TranscriptionCache  # noqa: E402
+
+
+def test_joined_caller_gets_the_transcript_after_the_first_is_cancelled(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcribe, "transcription_cache", TranscriptionCache(str(tmp_path / "cache.db")))
+
+    async def scenario():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def transcribe_spooled_file(audio_file, filename):
+            started.set()
+            await release.wait()
+            return audio_file.read().decode()
+        monkeypatch.setattr(transcribe, "transcribe_spooled_file", transcribe_spooled_file)
+
+        async def request():
+            # Like the upload routes, which close the upload however the call ends
+            upload = io.BytesIO(b"hello there")
+            try:
+                return await transcribe.transcribe_upload_file(upload, "audio.wav", digest="abc")
+            finally:
+                upload.close()
+
+        first = asyncio.create_task(request())
+        await started.wait()
+        second = asyncio.create_task(request())
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        return await second
+
+    assert asyncio.run(scenario()) == "hello there"
@@ -0,0 +1,75 @@
+import numpy as np
+
+from vad import StreamingSegmenter, TimestampMap, detect_speech, is_silent, trim_silence
+
+SAMPLE_RATE = 16000
+
+
+def speech_like(seconds, level_db=-20.0, modulation_db=10.0, rate_hz=4.0, seed=0):
+    """Noise whose loudness swings by modulation_db at a syllable-like rate."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope_db = level_db - modulation_db / 2 * (1 - np.cos(2 * np.pi * rate_hz * t))
+    carrier = rng.standard_normal(len(t))
+    return (carrier * 10 ** (envelope_db / 20)).astype(np.float32)
+
+
+def silence(seconds, level_db=-80.0, seed=1):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 10 ** (level_db / 20)).astype(np.float32)
+
+
+def covered(regions):
+    return sum(end - start for start, end in regions)
+
+
+def test_continuous_low_dynamic_range_speech_is_kept_whole():
+    samples = speech_like(8.0, modulation_db=12.0)
+    assert detect_speech(samples, SAMPLE_RATE) == [(0.0, 8.0)]
+
+
+def test_strongly_modulated_speech_is_not_cut():
+    samples = speech_like(8.0, modulation_db=20.0, rate_hz=0.5)
+    assert covered(detect_speech(samples, SAMPLE_RATE)) == 8.0
+
+
+def test_pauses_between_speech_are_trimmed():
+    samples = np.concatenate([silence(2.0), speech_like(3.0), silence(3.0), speech_like(2.0, seed=2), silence(2.0)])
+    regions = detect_speech(samples, SAMPLE_RATE)
+    assert len(regions) == 2
+    (first_start, first_end), (second_start, second_end) = regions
+    assert 1.6 <= first_start <= 2.0 and 5.0 <= first_end <= 5.4
+    assert 7.6 <= second_start <= 8.0 and 10.0 <= second_end <= 10.4
+
+    trimmed, timestamp_map = trim_silence(samples, SAMPLE_RATE)
+    assert len(trimmed) < len(samples)
+    assert abs(timestamp_map.to_original(0.0) - first_start) < 1e-6
+
+
+def test_only_audio_below_the_absolute_floor_is_silent():
+    assert detect_speech(np.zeros(SAMPLE_RATE * 2, dtype=np.float32), SAMPLE_RATE) == []
+    assert detect_speech(silence(2.0, level_db=-70.0), SAMPLE_RATE) == []
+
+
+def test_timestamp_map_joins():
+    timestamp_map = TimestampMap([(1.0, 2.0), (4.0, 6.0)])
+    assert timestamp_map.joins() == [1.0]
+    assert timestamp_map.to_original(1.5) == 4.5
+
+
+def test_segmenter_cuts_at_a_pause():
+    segmenter = StreamingSegmenter(SAMPLE_RATE, min_segment_seconds=2.0)
+    stream = np.concatenate([speech_like(3.0), silence(1.0), speech_like(3.0, seed=2)])
+    segments = []
+    for chunk in np.array_split(stream, 70):
+        segments += segmenter.push(chunk)
+    segments.append(segmenter.flush())
+    assert len(segments) == 2
+    cut = segments[1][0]
+    assert 3.0 <= cut <= 4.0
+
+
+def test_loud_segment_is_not_silent():
+    # A streamed segment that is speech throughout has no quieter frames of its own
+    assert not is_silent(speech_like(6.3, level_db=-6.0, modulation_db=6.0), SAMPLE_RATE)
+    assert is_silent(silence(1.0), SAMPLE_RATE)
@@ -1,91 +1,33 @@
 import streamlit as st
-import os
 import datetime
 from streamlit_mic_recorder import mic_recorder
-import httpx
-import asyncio
+from httpx import ConnectError, HTTPStatusError
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify
+from api_client import get_api_client
 
 
-server_url = "http://localhost:8000"
-
 load_dotenv()
 
 
-transcription_api = os.getenv("OPENAI_API_KEY")
-
-async def get_transcription(entry_id, audio_path):
-    # Get API token from environment variable
-    # transcription_api = os.getenv('TRANSCRIPTION_API_TOKEN')
-    # if not transcription_api:
-    #     st.error("Missing TRANSCRIPTION_API_TOKEN in environment variables")
-    #     return None
-
-
-    headers = {
-        "Authorization": f"Bearer {transcription_api}",  # Add 'Bearer ' prefix if required
-        "Content-Type": "application/json"
-    }
+def submit_recording(audio_bytes, filename):
+    """
+    Save the recording as a new entry and queue it for transcription and analysis.
+    The work runs in the background workers, so it survives navigating away.
 
+    The summary is no longer streamed onto this page: it is written by a worker after the
+    page has returned, and streaming it here would mean keeping the script blocked on the
+    whole pipeline again. It shows up on the Entries page once the entry is done.
+    """
+    api = get_api_client()
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"{server_url}/api/transcribe",
-                params={"filepath": audio_path},
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
-    except httpx.ConnectError:
-        st.error("Could not connect to the transcription server. Please make sure the FastAPI server is running.")
-        return None
+        return api.run(api.submit_recording(audio_bytes, filename))
+    except ConnectError:
+        st.error("Could not connect to the database server. Please make sure it is running.")
+    except HTTPStatusError as e:
+        st.error(f"Error while saving the recording: {e.response.text}")
     except Exception as e:
-        st.error(f"An error occurred during transcription: {str(e)}")
-        return None
-    
-
-async def generate_analysis(transcript):
-        """
-        Generate the analysis for a given transcript
-        """
-        script = {
-                "transcription": {
-                        "text": transcript,
-                        "metadata": {
-                        "timestamp": "2024-03-14T12:00:00Z"
-                        }
-                }
-        }
-        
-        prefix = "/analyze/"
-        endpoints = {
-                "title": server_url + prefix + "generate_title/",
-                "summary": server_url + prefix + "generate_summary/",
-                "keypoints": server_url + prefix + "generate_keypoints/"
-        }
-        
-        results = {}
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-                for name, endpoint in endpoints.items():
-                        try:
-                                response = await client.post(endpoint, json=script)
-                                response.raise_for_status()  # Raise an exception for bad status codes
-                                results[name] = response.json()
-                                st.write(f"{name.capitalize()} Response:", results[name])
-                        except httpx.TimeoutException:
-                                st.write(f"Timeout while fetching {name}")
-                                results[name] = None
-                        except httpx.HTTPError as e:
-                                st.write(f"HTTP error occurred while fetching {name}: {e}")
-                                results[name] = None
-                        except Exception as e:
-                                st.write(f"Unexpected error while fetching {name}: {e}")
-                                results[name] = None
-                                
-        
-        return results
+        st.error(f"An error occurred while saving the recording: {str(e)}")
+    return None
 
 # Configure the page
 st.set_page_config(
@@ -207,72 +149,17 @@ with col:
         st.session_state.audio_data = audio['bytes']
         
         
-        # st.write(os.getcwd() + "/fastapi-app/app/recordings") # correct path
-        full_path = os.path.join(os.path.dirname(__file__))
-        temp_dir = "fastapi-app/app/recordings/"
-        path = os.path.join(full_path, temp_dir)
-        os.makedirs(path, exist_ok=True)
-        
         # Generate unique filename with timestamp
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = os.path.join(path, "../", f"audio_{timestamp}.wav")
-        # st.write(f"Filename: {filename}")
-        
-        # Save the audio file
-        with open(filename, "wb") as f:
-            f.write(audio['bytes'])
-
-        # st.write("were here 2")
-        file_path = os.path.join(os.getcwd(), "fastapi-app", "app", "recordings", f"audio_{timestamp}.wav")
-        
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        # Write file
-        try:
-            with open(file_path, "wb") as f:
-                f.write(audio['bytes'])
-            # st.write(f"Successfully wrote to: {file_path}")
-        except Exception as e:
-            st.error(f"Error writing file: {str(e)}")
-            
-        # st.write("wrote to recordings")
-
-
-        try:
-            result = asyncio.run(get_transcription(1, audio_path=file_path))
-            # if result:
-                # st.success("Transcription completed successfully!")
-                # st.write(result)
-        except Exception as e:
-            st.error(f"Error during transcription process: {str(e)}")
-        
-
-        # Process the audio file
-        try:
-            analysis_data = asyncio.run(generate_analysis(result))
-            if analysis_data:
-                # Send data to database
-                try:
-                    db_url = "http://localhost:8080/api/journal_entries/"
-                    all_update_data = result | analysis_data
-                    response = httpx.post(db_url, json=all_update_data)
-                    response.raise_for_status()
-                    
-                    title = analysis_data.get('title', {}).get('title', 'your entry')
-                    
-                    # Clear any previous outputs
-                    st.empty()
-                    
-                    # Display success message with the latest entry ID and no underline
-                    st.markdown(
-                        f'yap sesh finished. Check out your <a href="/entryList" style="text-decoration: none">{title}</a> entry',
-                        unsafe_allow_html=True
-                    )
-                except Exception as e:
-                    st.error(f"Error saving to database: {str(e)}")
-        except Exception as e:
-            st.error(f"Error during transcription process: {str(e)}")
+        filename = f"audio_{timestamp}.wav"
+
+        entry = submit_recording(audio['bytes'], filename)
+        if entry:
+            # Display success message with a link to the entries list and no underline
+            st.markdown(
+                'yap sesh saved. Your entry is being processed, check <a href="/entryList" style="text-decoration: none">your entries</a> in a moment',
+                unsafe_allow_html=True
+            )
 
     # Always show the last recording if it exists
     if st.session_state.audio_data:
@@ -0,0 +1,110 @@
+"""
+Shared client for the journal database API.
+
+Streamlit reruns the page script on every interaction, so the client is created once per
+process through st.cache_resource. It keeps pooled keep-alive connections (HTTP/2 when the
+h2 package is installed and API_HTTP2 is on) and runs on its own event loop thread, so pages
+don't call asyncio.run on every rerun.
+"""
+import asyncio
+import os
+import threading
+from datetime import datetime
+from typing import List, Optional
+import httpx
+import streamlit as st
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+load_dotenv()
+
+DB_API_URL = os.getenv("DB_API_URL", "http://localhost:8080")
+API_HTTP2 = os.getenv("API_HTTP2", "true").lower() == "true"
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv("API_TIMEOUT_SECONDS", "10"))
+
+
+class Entry(BaseModel):
+    # List responses only carry entry_id, title, datetime_created and status
+    entry_id: int
+    user_id: Optional[int] = None
+    title: Optional[str] = None
+    datetime_created: datetime
+    transcription: Optional[str] = None
+    summary: Optional[str] = None
+    key_insights: Optional[str] = None
+    status: str = "done"  # "processing" while jobs for it are queued or running, or "failed"
+
+
+class EntryPage(BaseModel):
+    entries: List[Entry]
+    next_cursor: Optional[str] = None  # None on the last page
+
+
+class SearchResult(Entry):
+    snippet: str = ""  # HTML-escaped excerpt with the matched words in <mark> tags
+    rank: Optional[float] = None  # bm25, lower is a better match; None when listed newest first
+
+
+def http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class ApiClient:
+
+    def __init__(self, db_api_url=DB_API_URL, http2=API_HTTP2):
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="api-client", daemon=True).start()
+        options = dict(
+            http2=http2 and http2_available(),
+            timeout=DEFAULT_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        )
+        self.db = httpx.AsyncClient(base_url=db_api_url, **options)
+
+    def run(self, coroutine):
+        """Run a coroutine on the client's event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def submit_recording(self, audio_bytes, filename, timeout=DEFAULT_TIMEOUT_SECONDS) -> Entry:
+        """Store a recording as a new entry and queue it for background processing."""
+        response = await self.db.post(
+            "/api/journal_entries/audio/",
+            params={"filename": filename},
+            content=audio_bytes,
+            headers={"Content-Type": "application/octet-stream"},
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return Entry.model_validate(response.json())
+
+    async def get_entries(self, cursor=None, limit=None, timeout=DEFAULT_TIMEOUT_SECONDS) -> EntryPage:
+        """One page of the current user's entries, newest first. Pass next_cursor to get the next page."""
+        params = {key: value for key, value in {"cursor": cursor, "limit": limit}.items() if value is not None}
+        response = await self.db.get("/api/journal_entries/", params=params, timeout=timeout)
+        response.raise_for_status()
+        return EntryPage.model_validate(response.json())
+
+    async def search(self, text, limit=None, timeout=DEFAULT_TIMEOUT_SECONDS) -> List[SearchResult]:
+        """The current user's entries matching text, best match first."""
+        params = {"q": text} if limit is None else {"q": text, "limit": limit}
+        response = await self.db.get("/api/journal_entries/search/", params=params, timeout=timeout)
+        if response.status_code == 400:  # nothing searchable in text
+            return []
+        response.raise_for_status()
+        return [SearchResult.model_validate(result) for result in response.json()["results"]]
+
+    async def get_entry(self, entry_id, timeout=DEFAULT_TIMEOUT_SECONDS) -> Optional[Entry]:
+        response = await self.db.get(f"/api/journal_entries/{entry_id}/", timeout=timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return Entry.model_validate(response.json())
+
+
+@st.cache_resource
+def get_api_client() -> ApiClient:
+    return ApiClient()
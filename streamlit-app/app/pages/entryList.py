@@ -1,11 +1,6 @@
 import streamlit as st
-import sys
-import os
-from datetime import datetime
-
-# Add the db directory to Python path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../db')))
-from app import app, JournalEntry
+from api_client import get_api_client
+from paging import load_pages
 
 # Configure the page
 st.set_page_config(
@@ -71,38 +66,86 @@ st.markdown("""
         text-decoration: underline;
         color: #1565c0;  /* Darker shade on hover */
     }
+    .entry-snippet {
+        padding: 0 10px 15px 210px;
+        font-size: 0.9rem;
+        color: #5d4037;
+    }
+    .entry-status {
+        margin-left: 10px;
+        font-style: italic;
+        color: #8d6e63;
+    }
     </style>
     """, unsafe_allow_html=True)
 
 # Add the yap! title with link
 st.markdown('<a href="/" class="yap-title">yap!</a>', unsafe_allow_html=True)
 
-# Function to load entries from database
-def load_entries_from_db():
-    with app.app_context():
-        try:
-            # Get all entries, ordered by datetime_created descending (newest first)
-            entries = JournalEntry.query.order_by(JournalEntry.datetime_created.desc()).all()
-            return entries
-        except Exception as e:
-            st.error(f"Error loading entries from database: {str(e)}")
-            return []
+# Function to load the first pages of entries from the database API
+def load_entries_from_db(pages):
+    api = get_api_client()
+    try:
+        # Newest first
+        return load_pages(lambda cursor: api.run(api.get_entries(cursor)), pages)
+    except Exception as e:
+        st.error(f"Error loading entries from database: {str(e)}")
+        return [], None
 
 # Add Journal Entries title with new styling
 st.markdown('<div class="entry-title-header">Journal Entries</div>', unsafe_allow_html=True)
 
-# Create the entries list
-st.markdown('<div class="entry-list">', unsafe_allow_html=True)
-entries = load_entries_from_db()
-for entry in entries:
+query = st.text_input("Search entries", placeholder="Search titles, summaries and transcripts")
+
+def entry_title(entry):
+    # Entries still being transcribed/analyzed by the workers have no title yet
+    if entry.status == "done":
+        return f'<a href="individualEntry?entry_id={entry.entry_id}" class="entry-title" target="_self">{entry.title}</a>'
+    return f'<span class="entry-status">{entry.status}</span>'
+
+def render_entry(entry, snippet=None):
     # Format the date and time
     date_str = entry.datetime_created.strftime("%Y-%m-%d")
     time_str = entry.datetime_created.strftime("%H:%M")
-    
     st.markdown(f"""
         <div class="entry-item">
             <span class="entry-date">{date_str} {time_str}</span>
-            <a href="individualEntry?entry_id={entry.entry_id}" class="entry-title" target="_self">{entry.title}</a>
+            {entry_title(entry)}
         </div>
     """, unsafe_allow_html=True)
+    if snippet:
+        # Escaped by the API, with the matched words in <mark> tags
+        st.markdown(f'<div class="entry-snippet">{snippet}</div>', unsafe_allow_html=True)
+
+if query.strip():
+    api = get_api_client()
+    try:
+        results = api.run(api.search(query))
+    except Exception as e:
+        st.error(f"Error searching entries: {str(e)}")
+        results = []
+    st.markdown('<div class="entry-list">', unsafe_allow_html=True)
+    if not results:
+        st.write("No entries match your search.")
+    for result in results:
+        render_entry(result, result.snippet)
+    st.markdown('</div>', unsafe_allow_html=True)
+    st.stop()
+
+# Every loaded page is fetched again on each run so new and finished entries show up;
+# "Load more" only raises the number of pages kept in the session
+if "pages_loaded" not in st.session_state:
+    st.session_state.pages_loaded = 1
+
+entries, next_cursor = load_entries_from_db(st.session_state.pages_loaded)
+
+# Create the entries list
+st.markdown('<div class="entry-list">', unsafe_allow_html=True)
+for entry in entries:
+    render_entry(entry)
 st.markdown('</div>', unsafe_allow_html=True)
+
+if next_cursor:
+    if st.button("Load more"):
+        st.session_state.pages_loaded += 1
+        st.rerun()
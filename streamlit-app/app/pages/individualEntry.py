@@ -1,31 +1,24 @@
 import streamlit as st
-import sys
-import os
-from datetime import datetime
-from urllib.parse import parse_qs
-
-# Add the db directory to Python path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../db')))
-from app import app, JournalEntry
+from api_client import get_api_client
 
 def load_entry(entry_id):
-    """Load and return a specific entry by ID from database"""
-    with app.app_context():
-        try:
-            entry = JournalEntry.query.get(entry_id)
-            if entry:
-                return {
-                    "title": entry.title,
-                    "date": entry.datetime_created.strftime("%Y-%m-%d"),
-                    "time": entry.datetime_created.strftime("%H:%M"),
-                    "summary": entry.summary,
-                    "key_insights": entry.key_insights.split('\n') if entry.key_insights else [],
-                    "transcription": entry.transcription
-                }
-            return None
-        except Exception as e:
-            st.error(f"Error loading entry from database: {str(e)}")
-            return None
+    """Load and return a specific entry by ID from the database API"""
+    api = get_api_client()
+    try:
+        entry = api.run(api.get_entry(entry_id))
+        if entry:
+            return {
+                "title": entry.title,
+                "date": entry.datetime_created.strftime("%Y-%m-%d"),
+                "time": entry.datetime_created.strftime("%H:%M"),
+                "summary": entry.summary,
+                "key_insights": entry.key_insights.split('\n') if entry.key_insights else [],
+                "transcription": entry.transcription
+            }
+        return None
+    except Exception as e:
+        st.error(f"Error loading entry from database: {str(e)}")
+        return None
 
 def display_entry(entry):
     """Display a single entry with its full content"""
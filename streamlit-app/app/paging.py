@@ -0,0 +1,22 @@
+"""
+Rebuilding the entry list from its pages. Kept free of Streamlit so it can be tested on its own.
+"""
+
+
+def load_pages(fetch_page, pages):
+    """
+    Fetch the first `pages` pages of entries afresh, following each page's next_cursor.
+    Returns the entries and the cursor of the page after them (None when there is none).
+
+    Re-reading from the start keeps the pages contiguous when entries are added or removed
+    between reruns; replaying cursors saved earlier would skip an entry pushed across a page
+    boundary by a new one.
+    """
+    entries, cursor = [], None
+    for _ in range(pages):
+        page = fetch_page(cursor)
+        entries += page.entries
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    return entries, cursor
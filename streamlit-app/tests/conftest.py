@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app modules use flat imports (they run from streamlit-app/app), so do the same here
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+from paging import load_pages
+
+
+class EntryStore:
+    """In-memory stand-in for the list endpoint: newest first, keyset cursors."""
+
+    def __init__(self, entry_ids, page_size):
+        self.entry_ids = list(entry_ids)
+        self.page_size = page_size
+
+    def add(self, entry_id):
+        self.entry_ids.append(entry_id)
+
+    def fetch_page(self, cursor):
+        newest_first = sorted(self.entry_ids, reverse=True)
+        if cursor is not None:
+            newest_first = [entry_id for entry_id in newest_first if entry_id < cursor]
+        page = newest_first[:self.page_size]
+        more = len(newest_first) > self.page_size
+        return SimpleNamespace(entries=page, next_cursor=page[-1] if more else None)
+
+
+def test_loads_the_requested_number_of_pages():
+    store = EntryStore(range(1, 8), page_size=3)
+
+    entries, cursor = load_pages(store.fetch_page, 2)
+
+    assert entries == [7, 6, 5, 4, 3, 2]
+    assert cursor == 2
+
+
+def test_stops_after_the_last_page():
+    store = EntryStore(range(1, 5), page_size=3)
+
+    entries, cursor = load_pages(store.fetch_page, 5)
+
+    assert entries == [4, 3, 2, 1]
+    assert cursor is None
+
+
+def test_entry_added_between_pages_pushes_none_out():
+    store = EntryStore(range(1, 8), page_size=3)
+    load_pages(store.fetch_page, 2)  # "Load more" once
+
+    store.add(8)  # pushes 5 from the first page onto the second
+    entries, cursor = load_pages(store.fetch_page, 2)
+
+    assert entries == [8, 7, 6, 5, 4, 3]
+    assert cursor == 3
@@ -0,0 +1,194 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Shared by the FastAPI and Flask services so both can serve a /metrics endpoint
+without an extra dependency. Metrics are process-local and thread-safe.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: dict | None = None) -> str:
+    pairs = list(zip(labelnames, values)) + list((extra or {}).items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), registry: 'Registry | None' = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict = {}
+        self._lock = Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            lines += [
+                f'{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}'
+                for name, key, extra, value in self._samples()
+            ]
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        return [(self.name, key, None, value) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self):
+        return [(self.name, key, None, value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS,
+                 registry: 'Registry | None' = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def _samples(self):
+        samples = []
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', key, {'le': _format_value(bound)}, cumulative))
+            samples.append((f'{self.name}_sum', key, None, total))
+            samples.append((f'{self.name}_count', key, None, cumulative))
+        return samples
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics: dict = {}
+        self._lock = Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Metric {metric.name} is already registered')
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+
+# HTTP metrics, recorded by both services' request hooks
+http_requests_total = Counter(
+    'http_requests_total', 'HTTP requests handled', ('method', 'route', 'status'))
+http_request_duration_seconds = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency per route', ('method', 'route'))
+http_requests_in_flight = Gauge(
+    'http_requests_in_flight', 'HTTP requests currently being handled')
+
+# Upstream model calls
+upstream_request_duration_seconds = Histogram(
+    'upstream_request_duration_seconds', 'Latency of calls to upstream model APIs', ('upstream', 'operation'))
+upstream_requests_in_flight = Gauge(
+    'upstream_requests_in_flight', 'Calls to upstream model APIs currently in flight', ('upstream',))
+upstream_queue_wait_seconds = Histogram(
+    'upstream_queue_wait_seconds', 'Time spent waiting for a concurrency slot before an upstream call', ('upstream',))
+upstream_errors_total = Counter(
+    'upstream_errors_total', 'Failed calls to upstream model APIs', ('upstream', 'operation'))
+bedrock_tokens_total = Counter(
+    'bedrock_tokens_total', 'Tokens reported in the Bedrock usage field', ('model', 'kind'))
+audio_seconds_transcribed_total = Counter(
+    'audio_seconds_transcribed_total', 'Seconds of audio sent for transcription')
+
+vad_input_audio_seconds_total = Counter(
+    'vad_input_audio_seconds_total', 'Seconds of audio run through voice activity detection')
+vad_removed_audio_seconds_total = Counter(
+    'vad_removed_audio_seconds_total', 'Seconds of non-speech audio trimmed before transcription')
+vad_kept_ratio = Histogram(
+    'vad_kept_ratio', 'Fraction of each recording kept as speech by voice activity detection',
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0))
+
+pipeline_stage_duration_seconds = Histogram(
+    'pipeline_stage_duration_seconds', 'Time spent in each stage of end-to-end entry processing', ('stage',))
+
+
+def render() -> str:
+    return REGISTRY.render()